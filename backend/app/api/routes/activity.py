@@ -1,25 +1,26 @@
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db.session import get_db
-from app.models.user import User
+from app.db.session import get_async_db
 from app.schemas.task import ActivityLogResponse
-from app.repositories.activity_repo import ActivityRepository
+from app.repositories.activity_repo import AsyncActivityRepository
+from app.services.task_snapshots import task_snapshots
 from app.api.routes.auth import get_current_user
+from app.core.auth_cache import Principal
 
 router = APIRouter(prefix="/activity", tags=["Activity"])
 
 @router.get("/", response_model=List[ActivityLogResponse])
-def get_activity_logs(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    repo = ActivityRepository(db)
-    return repo.get_by_user(current_user.id)
+async def get_activity_logs(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    repo = AsyncActivityRepository(db)
+    return await repo.get_by_user(current_user.id)
 
 
 @router.delete("/{activity_id}", status_code=204)
-def delete_activity_log(activity_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    repo = ActivityRepository(db)
-    activity = repo.get(activity_id)
+async def delete_activity_log(activity_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    repo = AsyncActivityRepository(db)
+    activity = await repo.get(activity_id)
     if not activity:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Activity log not found")
@@ -27,5 +28,7 @@ def delete_activity_log(activity_id: int, current_user: User = Depends(get_curre
         from fastapi import HTTPException
         raise HTTPException(status_code=403, detail="Not authorized to delete this activity log")
     
-    repo.delete(activity_id)
+    task_id = activity.task_id
+    await repo.delete(activity_id)
+    await task_snapshots.invalidate([task_id])
     return None
@@ -1,10 +1,15 @@
+import hmac
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import get_async_db
 from app.models.user import User, UserRole
-from app.core.security import verify_password, get_password_hash, create_access_token, create_refresh_token, decode_token
+from app.core.auth_cache import Principal, principal_cache, principal_store
+from app.core.hashing import password_hasher
+from app.core.security import password_needs_rehash, create_access_token, create_refresh_token, decode_token
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
@@ -36,7 +41,12 @@ class TokenResponse(BaseModel):
     user: UserResponse
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    # Steady state: the token was verified recently, so skip both the JWT decode and the users query
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,30 +57,54 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if payload is None or payload.get("type") != "access":
         raise credentials_exception
     
-    user_id: int = payload.get("sub")
-    if user_id is None:
+    user_id = payload.get("sub")
+    if user_id is None or not str(user_id).isdigit():
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None or not user.is_active:
+    async def load():
+        user = await db.get(User, int(user_id))
+        if user is None:
+            return None
+        return Principal(id=user.id, username=user.username, role=user.role, is_active=user.is_active).to_json()
+
+    # First sight of this token on this worker: the user may still be cached locally or by another worker
+    data = await principal_store.get_or_load(int(user_id), load)
+    if data is None or not data["is_active"]:
         raise credentials_exception
     
-    return user
+    principal = Principal.from_json(data)
+    principal_cache.set(token, principal, payload.get("exp"))
+    return principal
+
+
+async def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+
+async def authorize_metrics_scrape(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> None:
+    """An admin, or a scraper presenting METRICS_TOKEN"""
+    if settings.METRICS_TOKEN and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return
+    await get_current_admin(await get_current_user(token, db))
 
 
 @router.post("/signup", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-def signup(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter((User.email == user_in.email) | (User.username == user_in.username)).first()
+async def signup(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where((User.email == user_in.email) | (User.username == user_in.username)))
+    existing_user = result.scalars().first()
     
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email or username already registered")
     
-    hashed_password = get_password_hash(user_in.password)
+    # bcrypt is CPU bound; it runs on the bounded hashing pool, which sheds load with 503
+    hashed_password = await password_hasher.hash(user_in.password)
     user = User(email=user_in.email, username=user_in.username, hashed_password=hashed_password, full_name=user_in.full_name)
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     access_token = create_access_token(data={"sub": user.id})
     refresh_token = create_refresh_token(data={"sub": user.id})
@@ -79,14 +113,23 @@ def signup(user_in: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter((User.username == form_data.username) | (User.email == form_data.username)).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where((User.username == form_data.username) | (User.email == form_data.username)))
+    user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password", headers={"WWW-Authenticate": "Bearer"})
     
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    if password_needs_rehash(user.hashed_password):
+        # BCRYPT_ROUNDS changed since this hash was made; the plain password is only at hand now
+        try:
+            user.hashed_password = await password_hasher.hash(form_data.password)
+            await db.commit()
+        except HTTPException:
+            pass  # Hashing pool is saturated: keep the old hash and try again on a later login
     
     access_token = create_access_token(data={"sub": user.id})
     refresh_token = create_refresh_token(data={"sub": user.id})
@@ -95,19 +138,22 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def get_me(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
 
 
 @router.post("/refresh", response_model=TokenResponse)
-def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async_db)):
     payload = decode_token(refresh_token)
     
     if payload is None or payload.get("type") != "refresh":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
     
     user_id = payload.get("sub")
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, int(user_id)) if str(user_id).isdigit() else None
     
     if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
@@ -1,56 +1,68 @@
 from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db.session import get_db
-from app.models.user import User
+from app.db.session import get_async_db
+from app.db.unit_of_work import AsyncUnitOfWork
 from app.schemas.task import CommentCreate, CommentResponse
-from app.repositories.comment_repo import CommentRepository
-from app.repositories.activity_repo import ActivityRepository
-from app.repositories.task_repo import TaskRepository
+from app.repositories.comment_repo import AsyncCommentRepository
+from app.services.activity_writer import record_activity
+from app.services.change_stream import change_broker, change_event
+from app.services.task_snapshots import task_snapshots
+from app.repositories.task_repo import AsyncTaskRepository, TaskLoad
 from app.api.routes.auth import get_current_user
+from app.core.auth_cache import Principal
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
 
 
 @router.get("/task/{task_id}", response_model=List[CommentResponse])
-def get_task_comments(task_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_task_comments(task_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Get all comments for a specific task"""
-    repo = CommentRepository(db)
-    return repo.get_by_task(task_id)
+    repo = AsyncCommentRepository(db)
+    return await repo.get_by_task(task_id)
 
 
 @router.post("/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
-def create_comment(comment_in: CommentCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_comment(comment_in: CommentCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Create a new comment on a task"""
-    repo = CommentRepository(db)
+    repo = AsyncCommentRepository(db)
     comment_data = comment_in.model_dump()
     comment_data['user_id'] = current_user.id
-    comment = repo.create(comment_data)
-    
-    # Create activity log
-    task_repo = TaskRepository(db)
-    task = task_repo.get(comment_in.task_id)
+    # The comment and its activity log are committed together
+    async with AsyncUnitOfWork(db):
+        comment = await repo.create(comment_data)
+
+        # Create activity log
+        task_repo = AsyncTaskRepository(db)
+        task = await task_repo.get(comment_in.task_id, load=TaskLoad.NONE)
+        if task:
+            await record_activity(db, [{
+                'action': 'comment_added',
+                'description': f'💬 {current_user.username} added a comment on "{task.title}"',
+                'task_id': comment_in.task_id,
+                'user_id': current_user.id
+            }])
     if task:
-        activity_repo = ActivityRepository(db)
-        activity_repo.create({
-            'action': 'comment_added',
-            'description': f'💬 {current_user.username} added a comment on "{task.title}"',
-            'task_id': comment_in.task_id,
-            'user_id': current_user.id
-        })
+        # Tasks are rendered with their comments
+        await task_snapshots.invalidate([task.id])
+        event = [change_event("comment.created", task.id, comment_id=comment.id)]
+        for user_id in {task.owner_id, current_user.id}:
+            await change_broker.publish(user_id, event)
     
     return comment
 
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_comment(comment_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def delete_comment(comment_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Delete a comment (only by the comment author)"""
-    repo = CommentRepository(db)
-    comment = repo.get(comment_id)
+    repo = AsyncCommentRepository(db)
+    comment = await repo.get(comment_id)
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
     if comment.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this comment")
     
-    repo.delete(comment_id)
+    task_id = comment.task_id
+    await repo.delete(comment_id)
+    await task_snapshots.invalidate([task_id])
     return None
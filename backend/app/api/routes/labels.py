@@ -1,49 +1,73 @@
 
 from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db.session import get_db
-from app.models.user import User
+from app.db.session import get_async_db
 from app.schemas.task import LabelCreate, LabelResponse
-from app.repositories.label_repo import LabelRepository
+from app.repositories.label_repo import AsyncLabelRepository
 from app.api.routes.auth import get_current_user
+from app.core.auth_cache import Principal
+from app.core.tiered_cache import TieredCache
+from app.services import task_service
+from app.services.task_snapshots import task_snapshots
 
 router = APIRouter(prefix="/labels", tags=["Labels"])
 
+# Each user's label list, rendered; read on every page that shows a label picker, written rarely
+label_list_cache = TieredCache("labels", lambda: task_service.async_redis_client)
+
+async def _label_changed(owner_id: int, tagged: List[tuple]) -> None:
+    """Drop what renders a renamed or deleted label: the label list, the tagged tasks' snapshots, and the
+    cached pages and stats (by_label, label-filtered membership) of everyone owning a tagged task"""
+    await label_list_cache.invalidate(owner_id)
+    await task_snapshots.invalidate(task_id for task_id, _ in tagged)
+    for task_owner_id in {owner_id} | {task_owner_id for _, task_owner_id in tagged}:
+        await task_service.invalidate_task_lists(task_owner_id)
+
 @router.get("/", response_model=List[LabelResponse])
-def get_labels(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    repo = LabelRepository(db)
-    return repo.get_by_owner(current_user.id)
+async def get_labels(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        labels = await AsyncLabelRepository(db).get_by_owner(current_user.id)
+        return [LabelResponse.model_validate(label).model_dump(mode="json") for label in labels]
+
+    return await label_list_cache.get_or_load(current_user.id, load)
 
 @router.post("/", response_model=LabelResponse, status_code=status.HTTP_201_CREATED)
-def create_label(label_in: LabelCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    repo = LabelRepository(db)
+async def create_label(label_in: LabelCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    repo = AsyncLabelRepository(db)
     label_data = label_in.model_dump()
     label_data['created_by'] = current_user.id
-    return repo.create(label_data)
+    label = await repo.create(label_data)
+    await label_list_cache.invalidate(current_user.id)
+    return label
 
 
 @router.put("/{label_id}", response_model=LabelResponse)
-def update_label(label_id: int, label_in: LabelCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    repo = LabelRepository(db)
-    label = repo.get(label_id)
+async def update_label(label_id: int, label_in: LabelCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    repo = AsyncLabelRepository(db)
+    label = await repo.get(label_id)
     if not label:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Label not found")
     if label.created_by != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this label")
     
     update_data = label_in.model_dump()
-    return repo.update(label, update_data)
+    tagged = await repo.tagged_tasks(label_id)
+    label = await repo.update(label, update_data)
+    await _label_changed(current_user.id, tagged)
+    return label
 
 
 @router.delete("/{label_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_label(label_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    repo = LabelRepository(db)
-    label = repo.get(label_id)
+async def delete_label(label_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    repo = AsyncLabelRepository(db)
+    label = await repo.get(label_id)
     if not label:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Label not found")
     if label.created_by != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this label")
     
-    repo.delete(label_id)
+    tagged = await repo.tagged_tasks(label_id)
+    await repo.delete(label_id)
+    await _label_changed(current_user.id, tagged)
     return None
@@ -1,24 +1,40 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, status
+from fastapi.concurrency import run_in_threadpool
+from app.db.session import SessionLocal
 from app.services.email_service import email_service
 from app.api.routes.auth import get_current_user
-from app.models.user import User
+from app.core.auth_cache import Principal
 
 router = APIRouter()
 
-@router.post("/notifications/check-overdue")
-async def check_overdue_tasks(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+
+def run_overdue_notifications(owner_ids: Optional[List[int]] = None) -> dict:
+    """One notifier run on its own session, for background tasks, cron jobs and scripts"""
+    db = SessionLocal()
+    try:
+        return email_service.check_and_notify_overdue_tasks(db, owner_ids)
+    finally:
+        db.close()
+
+
+async def mail_overdue_digests(tasks: list) -> None:
+    """Due-date scheduler listener: mail the owners of the tasks that just fell overdue their digests"""
+    if email_service.configured and tasks:
+        await run_in_threadpool(run_overdue_notifications, sorted({task.owner_id for task in tasks}))
+
+
+@router.post("/notifications/check-overdue", status_code=status.HTTP_202_ACCEPTED)
+def check_overdue_tasks(
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_user)
 ):
     """
-    Manually trigger check for overdue tasks and send email notifications.
+    Trigger a check for overdue tasks; digests are mailed in the background after the response.
     This can be called by a cron job or scheduled task.
     """
-    notifications_sent = email_service.check_and_notify_overdue_tasks(db)
-    
-    return {
-        "message": f"Checked overdue tasks. Sent {notifications_sent} notifications.",
-        "notifications_sent": notifications_sent
-    }
+    if email_service.running:
+        return {"message": "An overdue notification run is already in progress.", "started": False}
+
+    background_tasks.add_task(run_overdue_notifications)
+    return {"message": "Overdue notification run started.", "started": True}
@@ -1,25 +1,33 @@
-from fastapi import APIRouter, Depends, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
-from app.db.session import get_db
-from app.models.user import User
+from datetime import date
+from app.core.config import settings
+from app.core.security import decode_token
+from app.db.session import get_async_db, AsyncSessionLocal
 from app.models.task import TaskStatus, TaskPriority
-from app.schemas.task import TaskCreate, TaskUpdate, TaskResponse, TaskListResponse
-from app.services.task_service import TaskService
+from app.schemas.task import TaskCreate, TaskUpdate, TaskResponse, TaskListResponse, TaskStatsResponse, TaskCalendarResponse, TaskBulkCreate, TaskBulkUpdate, TaskBulkIds, BulkItemResult, BulkResponse
+from app.services.task_service import AsyncTaskService
+from app.services.change_stream import change_broker
 from app.api.routes.auth import get_current_user
+from app.core.auth_cache import Principal
+import asyncio
+import json
 import math
+import time
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
 
 @router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
-def create_task(task_in: TaskCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    service = TaskService(db)
-    return service.create_task(task_in, current_user.id)
+async def create_task(task_in: TaskCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return await service.create_task(task_in, current_user.id)
 
 
 @router.get("/", response_model=TaskListResponse)
-def get_tasks(
+async def get_tasks(
     search: Optional[str] = Query(None, description="Search in title and description"),
     status: Optional[TaskStatus] = Query(None, description="Filter by status"),
     priority: Optional[TaskPriority] = Query(None, description="Filter by priority"),
@@ -27,45 +35,181 @@ def get_tasks(
     overdue: bool = Query(False, description="Show only overdue tasks"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
-    sort_by: str = Query("created_at", description="Sort by field (created_at, due_date, priority)"),
+    sort_by: str = Query("created_at", description="Sort by field (created_at, due_date, priority, relevance)"),
     sort_order: str = Query("desc", description="Sort order (asc, desc)"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor/prev_cursor from a previous page; overrides page"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    service = TaskService(db)
+    service = AsyncTaskService(db)
     label_id_list = None
     if label_ids:
         label_id_list = [int(x) for x in label_ids.split(",")]
     
-    tasks, total = service.get_tasks(
+    tasks, total, next_cursor, prev_cursor = await service.get_tasks(
         owner_id=current_user.id, search=search, status=status, priority=priority,
         label_ids=label_id_list, overdue_only=overdue, page=page, page_size=page_size,
-        sort_by=sort_by, sort_order=sort_order
+        sort_by=sort_by, sort_order=sort_order, cursor=cursor
     )
     
     total_pages = math.ceil(total / page_size)
-    return TaskListResponse(tasks=tasks, total=total, page=page, page_size=page_size, total_pages=total_pages)
+    # The tasks come rendered (mostly from their cached snapshots) and are spliced in as they are;
+    # the remaining fields follow TaskListResponse
+    page_fields = json.dumps({"total": total, "page": page, "page_size": page_size, "total_pages": total_pages,
+                              "next_cursor": next_cursor, "prev_cursor": prev_cursor}, separators=(",", ":"))
+    return Response(content='{"tasks":[' + ",".join(tasks) + "]," + page_fields[1:], media_type="application/json")
+
+
+@router.get("/calendar", response_model=TaskCalendarResponse)
+async def get_task_calendar(
+    start: date = Query(..., description="First day of the window (UTC)"),
+    end: date = Query(..., description="Last day of the window, inclusive (UTC)"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Compact summaries of the tasks due in a date window, grouped by day"""
+    service = AsyncTaskService(db)
+    return await service.get_calendar(current_user.id, start, end)
+
+
+@router.get("/stats", response_model=TaskStatsResponse)
+async def get_task_stats(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Counts by status, priority, label, overdue and due within 7 days for the dashboard"""
+    service = AsyncTaskService(db)
+    return await service.get_stats(current_user.id)
+
+
+async def _stream_principal(token: Optional[str]) -> tuple[Principal, float]:
+    """Authenticate a stream and return (principal, token expiry as a Unix time)"""
+    payload = decode_token(token) if token else None
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials",
+                            headers={"WWW-Authenticate": "Bearer"})
+    # Streams outlive the request: use a short-lived session rather than pinning a pooled connection
+    async with AsyncSessionLocal() as db:
+        principal = await get_current_user(token, db)
+    return principal, payload["exp"]
+
+
+def _stream_token(authorization: Optional[str], token: Optional[str]) -> Optional[str]:
+    # EventSource and browser WebSockets cannot set headers, so the access token may come as ?token=
+    if token:
+        return token
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return None
+
+
+@router.get("/stream")
+async def stream_task_changes(
+    request: Request,
+    token: Optional[str] = Query(None, description="Access token, for clients that cannot send an Authorization header"),
+    authorization: Optional[str] = Header(None),
+):
+    """Server-sent events for the user's task and comment changes.
+
+    Each event is a compact JSON object such as {"type": "task.updated", "task_id": 7,
+    "fields": ["status"]}; on "resync" the client should refetch. The stream ends when
+    the access token expires and the client reconnects with a fresh one.
+    """
+    principal, expires_at = await _stream_principal(_stream_token(authorization, token))
+
+    async def events():
+        yield "retry: 5000\n\n"
+        async for event in change_broker.listen(principal.id, settings.STREAM_HEARTBEAT):
+            if time.time() >= expires_at or await request.is_disconnected():
+                break
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/stream/ws")
+async def stream_task_changes_ws(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """WebSocket variant of /tasks/stream: the same events as JSON text frames"""
+    try:
+        principal, expires_at = await _stream_principal(
+            _stream_token(websocket.headers.get("authorization"), token))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async def send_events():
+        async for event in change_broker.listen(principal.id, settings.STREAM_HEARTBEAT):
+            if time.time() >= expires_at:
+                break
+            await websocket.send_json(event if event is not None else {"type": "ping"})
+
+    async def wait_for_disconnect():
+        # Nothing is expected from the client; reading is how a closed socket is noticed
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    sender, receiver = asyncio.create_task(send_events()), asyncio.create_task(wait_for_disconnect())
+    done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    if sender in done:
+        await websocket.close()
+
+
+def _bulk_response(results: List[BulkItemResult]) -> BulkResponse:
+    succeeded = sum(1 for r in results if r.success)
+    return BulkResponse(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+
+@router.post("/bulk/create", response_model=BulkResponse)
+async def bulk_create_tasks(payload: TaskBulkCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return _bulk_response(await service.bulk_create_tasks(payload.tasks, current_user.id))
+
+
+@router.post("/bulk/update", response_model=BulkResponse)
+async def bulk_update_tasks(payload: TaskBulkUpdate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return _bulk_response(await service.bulk_update_tasks(payload.tasks, current_user.id))
+
+
+@router.post("/bulk/delete", response_model=BulkResponse)
+async def bulk_delete_tasks(payload: TaskBulkIds, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return _bulk_response(await service.bulk_delete_tasks(payload.ids, current_user.id))
+
+
+@router.post("/bulk/restore", response_model=BulkResponse)
+async def bulk_restore_tasks(payload: TaskBulkIds, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return _bulk_response(await service.bulk_restore_tasks(payload.ids, current_user.id))
 
 
 @router.get("/{task_id}", response_model=TaskResponse)
-def get_task(task_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    service = TaskService(db)
-    return service.get_task(task_id, current_user.id)
+async def get_task(task_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return await service.get_task(task_id, current_user.id)
 
 
 @router.put("/{task_id}", response_model=TaskResponse)
-def update_task(task_id: int, task_in: TaskUpdate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    service = TaskService(db)
-    return service.update_task(task_id, task_in, current_user.id)
+async def update_task(task_id: int, task_in: TaskUpdate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return await service.update_task(task_id, task_in, current_user.id)
 
 
 @router.delete("/{task_id}", response_model=TaskResponse)
-def delete_task(task_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    service = TaskService(db)
-    return service.delete_task(task_id, current_user.id)
+async def delete_task(task_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return await service.delete_task(task_id, current_user.id)
 
 
 @router.post("/{task_id}/restore", response_model=TaskResponse)
-def restore_task(task_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    service = TaskService(db)
-    return service.restore_task(task_id, current_user.id)
\ No newline at end of file
+async def restore_task(task_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncTaskService(db)
+    return await service.restore_task(task_id, current_user.id)
\ No newline at end of file
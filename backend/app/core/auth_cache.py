@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.core.tiered_cache import TieredCache
+from app.models.user import User, UserRole
+
+
+@dataclass(frozen=True)
+class Principal:
+    """What routes need to know about the authenticated user, without a users row"""
+    id: int
+    username: str
+    role: str
+    is_active: bool
+
+    def to_json(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Principal":
+        return cls(id=data["id"], username=data["username"], role=UserRole(data["role"]), is_active=data["is_active"])
+
+
+class PrincipalCache:
+    """Bounded LRU of verified access token -> Principal.
+
+    Entries expire after `ttl` seconds or when the token itself expires,
+    whichever is first, and are dropped when the user row changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple[Principal, float]]" = OrderedDict()
+        self._tokens_by_user: dict[int, set] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return principal
+
+    def set(self, token: str, principal: Principal, token_exp: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        lifetime = self.ttl
+        if token_exp is not None:
+            lifetime = min(lifetime, token_exp - time.time())
+        if lifetime <= 0:
+            return
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (principal, time.monotonic() + lifetime)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, token: str) -> None:
+        # Caller holds the lock
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0].id]
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+
+
+def _redis():
+    from app.services import task_service
+    return task_service.async_redis_client
+
+
+def _drop_tokens(user_ids) -> None:
+    for user_id in user_ids:
+        principal_cache.invalidate_user(int(user_id))
+
+
+# User id -> Principal.to_json(), shared by all workers: a token this worker has not verified yet still
+# skips the users query. Invalidating a user here also drops their tokens from every worker's principal_cache.
+principal_store = TieredCache("principal", _redis, redis_ttl=settings.PRINCIPAL_CACHE_TTL, on_drop=_drop_tokens)
+
+# Background invalidations, referenced until done
+_pending = set()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # Deactivation, role or username changes must not be served from the cache
+    principal_cache.invalidate_user(target.id)
+    # The shared tiers are invalidated once the change is committed; earlier, a concurrent read could refill them
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    user_ids = session.info.pop("changed_user_ids", None)
+    if not user_ids:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        task = loop.create_task(principal_store.invalidate(*user_ids))
+        _pending.add(task)
+        task.add_done_callback(_pending.discard)
+        return
+
+    # A sync session, outside the event loop
+    from app.services import task_service
+    principal_store.invalidate_sync(task_service.redis_client, *user_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_users(session, previous_transaction):
+    session.info.pop("changed_user_ids", None)
@@ -0,0 +1,114 @@
+"""Dedicated, bounded executor for bcrypt.
+
+A bcrypt hash or check costs a few hundred milliseconds of CPU. Run on the
+shared threadpool, a burst of logins takes every slot and starves unrelated
+requests. Here they run on their own pool of HASH_WORKERS processes, so they
+scale past the GIL and leave the API threadpool alone, and at most
+HASH_MAX_PENDING calls may be running or waiting at once. Beyond that a call
+fails fast with 503 and Retry-After rather than queueing behind work it would
+time out waiting for.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_password
+
+
+def _timed(fn, *args):
+    """Runs in the worker: report when the call started so the caller can derive its queue time"""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int, use_processes: bool = True):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.peak_pending = 0
+        self.max_queue_ms = 0.0
+        self._total_queue_ms = 0.0
+        self._total_run_ms = 0.0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                # spawn: forking a process that runs an event loop and DB pools is not safe
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many authentication requests, retry shortly",
+                                headers={"Retry-After": "1"})
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        submitted = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, run_seconds = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool for the next call
+            self._executor = None
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Authentication temporarily unavailable, retry shortly",
+                                headers={"Retry-After": "1"})
+        finally:
+            self.pending -= 1
+        queue_ms = max(started - submitted, 0) * 1000
+        self.completed += 1
+        self.max_queue_ms = max(self.max_queue_ms, queue_ms)
+        self._total_queue_ms += queue_ms
+        self._total_run_ms += run_seconds * 1000
+        return result
+
+    async def hash(self, password: str) -> str:
+        # Pass the cost explicitly: worker processes have their own copy of settings
+        return await self._run(get_password_hash, password, settings.BCRYPT_ROUNDS)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, password, hashed_password)
+
+    def start(self) -> None:
+        """Spawn the workers now instead of on the first logins after a deploy"""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_timed, verify_password, "", "")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "executor": "process" if self.use_processes else "thread",
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_queue_ms": round(self._total_queue_ms / self.completed, 3) if self.completed else 0.0,
+            "max_queue_ms": round(self.max_queue_ms, 3),
+            "avg_run_ms": round(self._total_run_ms / self.completed, 3) if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(settings.HASH_WORKERS, settings.HASH_MAX_PENDING, settings.HASH_PROCESS_POOL)
@@ -0,0 +1,46 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(sort_by: str, sort_order: str, values: list, direction: str = "next") -> str:
+    """Encode a keyset position into an opaque, URL-safe cursor string"""
+    payload = {
+        "s": sort_by,
+        "o": sort_order,
+        "d": direction,
+        "v": [_encode_value(v) for v in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        direction = payload["d"]
+        if direction not in ("next", "prev") or not isinstance(payload["v"], list):
+            raise ValueError("Malformed cursor")
+        return {
+            "sort_by": payload["s"],
+            "sort_order": payload["o"],
+            "direction": direction,
+            "values": [_decode_value(v) for v in payload["v"]],
+        }
+    except (KeyError, TypeError, UnicodeError, json.JSONDecodeError, binascii.Error) as e:
+        raise ValueError("Malformed cursor") from e
@@ -13,13 +13,21 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 
 
-def get_password_hash(password: str) -> str:
-    """Hash a password using bcrypt"""
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    """Hash a password using bcrypt at `rounds` (default BCRYPT_ROUNDS)"""
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds or settings.BCRYPT_ROUNDS)
     return bcrypt.hashpw(pwd_bytes, salt).decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when the hash was made with a cost factor other than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed_password.split('$')[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     try:
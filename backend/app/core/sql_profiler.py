@@ -0,0 +1,178 @@
+"""Per-request SQL profiler and N+1 detector (SQL_PROFILER=true; development and staging).
+
+Cursor listeners on both engines record every statement of the request being
+served. Statements are grouped by shape, i.e. their SQL with placeholder lists
+collapsed, so the 20 lazy loads of one relationship for a page of 20 tasks fall
+into one group; a shape run SQL_PROFILER_REPEAT_THRESHOLD times or more is
+reported as a likely N+1.
+
+Each profiled response carries X-SQL-Queries, X-SQL-Time-Ms, X-SQL-N-Plus-One
+and a Server-Timing entry; the last SQL_PROFILER_LOG_SIZE request reports are
+kept for /stats/sql-profile and flagged ones are logged.
+
+``query_budget`` asserts statement counts in tests, with or without the setting:
+
+    def test_task_list_query_budget(client, auth_headers):
+        with query_budget(5) as profile:
+            client.get("/api/v1/tasks/", headers=auth_headers)
+        assert not profile.repeated()
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter as _Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = r"(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL with IN-lists and VALUES rows collapsed, so statements differing only in list length group together"""
+    return _WHITESPACE.sub(" ", _PLACEHOLDER_LIST.sub("(…)", statement)).strip()
+
+
+class Profile:
+    """Statements recorded while a request or a query_budget block was active"""
+
+    def __init__(self):
+        self.statements: List[tuple] = []  # (statement, seconds)
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.statements.append((statement, seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(seconds for _, seconds in self.statements)
+
+    def repeated(self, threshold: Optional[int] = None) -> List[dict]:
+        """Statement shapes run at least `threshold` times, most frequent first"""
+        threshold = threshold or settings.SQL_PROFILER_REPEAT_THRESHOLD
+        counts, times = _Counter(), _Counter()
+        for statement, seconds in self.statements:
+            shape = statement_shape(statement)
+            counts[shape] += 1
+            times[shape] += seconds
+        return [{"shape": shape, "count": count, "total_ms": round(times[shape] * 1000, 3)}
+                for shape, count in counts.most_common() if count >= threshold]
+
+
+_current: ContextVar[Optional[Profile]] = ContextVar("sql_profile", default=None)
+# query_budget blocks see statements from every thread (TestClient serves requests on its own)
+_budgets: List[Profile] = []
+_installed = set()
+recent_reports: deque = deque(maxlen=settings.SQL_PROFILER_LOG_SIZE)
+
+
+def install(engine) -> None:
+    """Attach the recording listeners to `engine` (sync or async); idempotent"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if id(sync_engine) in _installed:
+        return
+    _installed.add(id(sync_engine))
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info["profiler_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        if profile is None and not _budgets:
+            return
+        elapsed = time.perf_counter() - conn.info.pop("profiler_started", time.perf_counter())
+        if profile is not None:
+            profile.add(statement, elapsed)
+        for budget in list(_budgets):
+            budget.add(statement, elapsed)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Fail with the offending statements if the block runs more than `max_queries` SQL statements"""
+    from app.db.session import engine, async_engine
+    install(engine)
+    install(async_engine)
+    profile = Profile()
+    _budgets.append(profile)
+    try:
+        yield profile
+    finally:
+        _budgets.remove(profile)
+    if profile.count > max_queries:
+        shapes = _Counter(statement_shape(statement) for statement, _ in profile.statements)
+        listing = "\n".join(f"  {count}x {shape[:300]}" for shape, count in shapes.most_common())
+        raise QueryBudgetExceeded(f"{profile.count} SQL statements, budget {max_queries}:\n{listing}")
+
+
+class SQLProfilerMiddleware:
+    """Profile each HTTP request and report the result in headers and the rolling log"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile()
+        token = _current.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                repeated = profile.repeated()
+                db_ms = profile.seconds * 1000
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-sql-queries", str(profile.count).encode()),
+                    (b"x-sql-time-ms", f"{db_ms:.2f}".encode()),
+                    (b"x-sql-n-plus-one", str(len(repeated)).encode()),
+                    (b"server-timing", f"db;desc=\"{profile.count} queries\";dur={db_ms:.2f}".encode()),
+                ]
+                self._report(scope, profile, repeated, db_ms, message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+
+    @staticmethod
+    def _report(scope, profile: Profile, repeated: List[dict], db_ms: float, status_code: int) -> None:
+        report = {
+            "at": datetime.utcnow().isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "status": status_code,
+            "queries": profile.count,
+            "db_ms": round(db_ms, 3),
+            "repeated": repeated,
+        }
+        recent_reports.append(report)
+        if repeated:
+            logger.warning("Possible N+1 in %s %s: %s", report["method"], report["route"],
+                           "; ".join(f"{r['count']}x {r['shape'][:120]}" for r in repeated))
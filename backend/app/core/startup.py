@@ -0,0 +1,47 @@
+"""Per-phase timing of a worker's boot, served at /stats/startup.
+
+Import this module before anything else in app.main: its import time is the
+zero of the report.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.ready_ms: Optional[float] = None
+        self._last = self.started
+
+    def mark(self, name: str) -> None:
+        """Close a phase that ran since the previous mark, e.g. a block of imports"""
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        self._last = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name)
+
+    def finish(self) -> None:
+        self.ready_ms = (time.perf_counter() - self.started) * 1000
+        logger.info("Startup took %.0f ms: %s", self.ready_ms,
+                    ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.phases))
+
+    def report(self) -> dict:
+        return {
+            "ready_ms": round(self.ready_ms, 1) if self.ready_ms is not None else None,
+            "phases": [{"name": name, "ms": round(ms, 1)} for name, ms in self.phases],
+        }
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,307 @@
+"""Two-tier caching: a bounded in-process LRU in front of Redis.
+
+A hit in the local tier costs a dict lookup: no network round trip, no JSON
+decoding. Local entries live at most LOCAL_CACHE_TTL seconds, and explicit
+invalidations reach every worker through one Redis pub/sub channel: the
+invalidating worker drops its own entries at once and publishes the keys, and
+every worker's InvalidationBus drops them from its cache of the same name.
+Messages missed while the subscription was down cannot be replayed, so every
+local cache is cleared when it is re-established; LOCAL_CACHE_TTL bounds
+staleness if the bus cannot run at all.
+
+LocalCache is the local tier on its own, for values whose Redis tier is owned
+elsewhere (the task list and stats caches); TieredCache combines it with a
+Redis tier of JSON values.
+
+Nothing that decides freshness belongs in a local tier: the task caches' keys
+embed the per-user generation, which is read from Redis on every request, so a
+worker that has not yet heard of an invalidation still sees the user's writes.
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import cache_tier_requests, redis_duration, timed
+
+CHANNEL = "cache:invalidate"
+MISSING = object()
+
+
+class LocalCache:
+    """Thread-safe LRU of at most `maxsize` entries, each expiring after its own TTL"""
+
+    def __init__(self, name: str, maxsize: int = None, ttl: float = None,
+                 on_drop: Optional[Callable[[List[str]], None]] = None):
+        self.name = name
+        self.maxsize = settings.LOCAL_CACHE_SIZE if maxsize is None else maxsize
+        self.ttl = settings.LOCAL_CACHE_TTL if ttl is None else ttl
+        # Called with the keys of every invalidation, local or from another worker
+        self.on_drop = on_drop
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every drop and clear: a value loaded while it changed may predate the invalidation
+        self.version = 0
+        self._entries: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        invalidation_bus.register(self)
+
+    def get(self, key: str) -> Any:
+        """The cached value, or MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cache_tier_requests.inc(self.name, "local", "hit")
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        cache_tier_requests.inc(self.name, "local", "miss")
+        return MISSING
+
+    def set(self, key: str, value: Any, ttl: float = None, version: int = None) -> None:
+        """Store `value`; with `version` (read before loading it) only if nothing was invalidated since"""
+        lifetime = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or lifetime <= 0:
+            return
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = (value, time.monotonic() + lifetime)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def drop(self, keys: Iterable[str]) -> None:
+        keys = [str(key) for key in keys]
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+            self.version += 1
+        if self.on_drop is not None:
+            self.on_drop(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.version += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class TieredCache:
+    """LocalCache in front of JSON values in Redis under ``{name}:{key}``; get() returns None on a miss of both"""
+
+    def __init__(self, name: str, redis: Callable[[], Any], redis_ttl: int = None, **local_options):
+        self.name = name
+        # Resolved on every call, so a client swapped in after import (tests, benchmarks) is used
+        self._redis = redis
+        self.redis_ttl = settings.CACHE_TTL if redis_ttl is None else redis_ttl
+        self.local = LocalCache(name, **local_options)
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    async def get(self, key) -> Any:
+        key = str(key)
+        value = self.local.get(key)
+        if value is not MISSING:
+            return value
+        version = self.local.version
+        try:
+            with timed(redis_duration, self.name):
+                raw = await self._redis().get(self._redis_key(key))
+        except Exception as e:
+            self.redis_errors += 1
+            cache_tier_requests.inc(self.name, "redis", "error")
+            print(f"Redis error during cache retrieval: {e}")
+            return None
+        if raw is None:
+            self.redis_misses += 1
+            cache_tier_requests.inc(self.name, "redis", "miss")
+            return None
+        self.redis_hits += 1
+        cache_tier_requests.inc(self.name, "redis", "hit")
+        value = json.loads(raw)
+        self.local.set(key, value, version=version)
+        return value
+
+    async def get_or_load(self, key, load: Callable[[], Awaitable[Any]]) -> Any:
+        """get(), falling back to `await load()`; a loaded value that is not None is cached in both tiers"""
+        value = await self.get(key)
+        if value is not None:
+            return value
+        version = self.local.version
+        value = await load()
+        # Skipped when an invalidation arrived meanwhile: the value may have been read before the change
+        if value is not None and self.local.version == version:
+            await self.set(key, value)
+        return value
+
+    async def set(self, key, value: Any) -> None:
+        key = str(key)
+        self.local.set(key, value)
+        try:
+            await self._redis().setex(self._redis_key(key), self.redis_ttl, json.dumps(value))
+        except Exception as e:
+            print(f"Redis error during cache set: {e}")
+
+    async def invalidate(self, *keys) -> None:
+        """Drop `keys` from both tiers here and from the local tier of every other worker"""
+        keys = [str(key) for key in keys]
+        self.local.drop(keys)
+        try:
+            await self._redis().delete(*(self._redis_key(key) for key in keys))
+        except Exception as e:
+            print(f"Redis error during cache invalidation: {e}")
+        await invalidation_bus.publish(self._redis(), self.name, keys)
+
+    def invalidate_sync(self, redis_client, *keys) -> None:
+        """invalidate() for code outside the event loop, through a sync Redis client"""
+        keys = [str(key) for key in keys]
+        self.local.drop(keys)
+        try:
+            redis_client.delete(*(self._redis_key(key) for key in keys))
+        except Exception as e:
+            print(f"Redis error during cache invalidation: {e}")
+        invalidation_bus.publish_sync(redis_client, self.name, keys)
+
+    def stats(self) -> dict:
+        lookups = self.redis_hits + self.redis_misses
+        return {
+            "local": self.local.stats(),
+            "redis": {
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "errors": self.redis_errors,
+                "hit_rate": round(self.redis_hits / lookups, 4) if lookups else None,
+            },
+        }
+
+
+class InvalidationBus:
+    """Drops invalidated keys from this worker's local caches when any worker invalidates them"""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.redis = None
+        self.published = 0
+        self.received = 0
+        self.resets = 0
+        self._caches: Dict[str, List[LocalCache]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def register(self, cache: LocalCache) -> None:
+        self._caches.setdefault(cache.name, []).append(cache)
+
+    @property
+    def running(self) -> bool:
+        return self._listener is not None and not self._listener.done()
+
+    async def start(self, redis_client) -> None:
+        if self._listener is not None:
+            return
+        self.redis = redis_client
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def publish(self, redis_client, cache: str, keys: List[str]) -> None:
+        """Tell the other workers; the caller has already dropped the keys locally"""
+        if not keys:
+            return
+        try:
+            await redis_client.publish(CHANNEL, self._message(cache, keys))
+            self.published += 1
+        except Exception as e:
+            print(f"Redis error during cache invalidation publish: {e}")
+
+    def _message(self, cache: str, keys: List[str]) -> str:
+        return json.dumps({"origin": self.worker_id, "cache": cache, "keys": keys})
+
+    def publish_sync(self, redis_client, cache: str, keys: List[str]) -> None:
+        """publish() through a sync Redis client, for code outside the event loop (session event hooks, scripts)"""
+        if not keys:
+            return
+        try:
+            redis_client.publish(CHANNEL, self._message(cache, keys))
+            self.published += 1
+        except Exception as e:
+            print(f"Redis error during cache invalidation publish: {e}")
+
+    def clear_local(self) -> None:
+        """Empty every local cache of this worker"""
+        for caches in self._caches.values():
+            for cache in caches:
+                cache.clear()
+        self.resets += 1
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                # Invalidations published before (or while re-) subscribing are lost
+                self.clear_local()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload["origin"] == self.worker_id:
+                        continue
+                    self.received += 1
+                    for cache in self._caches.get(payload["cache"], ()):
+                        cache.drop(payload["keys"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Redis error in cache invalidation subscription: {e}")
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(settings.STREAM_RETRY_INTERVAL)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "worker_id": self.worker_id,
+            "published": self.published,
+            "received": self.received,
+            "resets": self.resets,
+            "caches": {name: [cache.stats() for cache in caches] for name, caches in self._caches.items()},
+        }
+
+
+invalidation_bus = InvalidationBus()
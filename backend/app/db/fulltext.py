@@ -0,0 +1,94 @@
+"""Full-text search index over task titles and descriptions.
+
+Postgres keeps a generated, weighted ``tasks.search_vector`` tsvector column
+behind a GIN index. SQLite keeps an external-content FTS5 table (``tasks_fts``)
+synced by triggers. Both are installed by migration 002 and, for databases
+built with ``Base.metadata.create_all``, right after the tasks table is created.
+"""
+import re
+from typing import List
+
+from sqlalchemy import column, table
+
+TASKS_FTS = table("tasks_fts", column("rowid"), column("rank"))
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+]
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, content='tasks', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    # Backfill rows that existed before the index
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS ix_tasks_search_vector",
+    "ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS tasks_fts_au",
+    "DROP TRIGGER IF EXISTS tasks_fts_ad",
+    "DROP TRIGGER IF EXISTS tasks_fts_ai",
+    "DROP TABLE IF EXISTS tasks_fts",
+]
+
+
+def install(connection) -> None:
+    """Create (or backfill) the full-text index for the connection's dialect"""
+    statements = {"postgresql": POSTGRES_DDL, "sqlite": SQLITE_DDL}.get(connection.dialect.name, [])
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def uninstall(connection) -> None:
+    statements = {"postgresql": POSTGRES_DROP, "sqlite": SQLITE_DROP}.get(connection.dialect.name, [])
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def after_tasks_create(target, connection, **kw) -> None:
+    install(connection)
+
+
+def search_terms(text: str) -> List[str]:
+    """Split free text into index terms. Punctuation is dropped so user input can never break the query syntax."""
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def postgres_query(terms: List[str]) -> str:
+    """to_tsquery() text matching every term as a prefix, so partially typed words still match"""
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def sqlite_query(terms: List[str]) -> str:
+    """FTS5 MATCH text matching every term as a prefix, so partially typed words still match"""
+    return " ".join(f'"{t}"*' for t in terms)
@@ -0,0 +1,61 @@
+"""In-process schema check and upgrade used at startup.
+
+Instead of shelling out to ``alembic upgrade head`` on every boot, compare the
+revision stored in ``alembic_version`` with the head of migrations/ and only run
+the upgrade when they differ. On Postgres the upgrade holds an advisory lock, so
+workers booting together do not race each other through the same migration.
+"""
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+# Arbitrary constant shared by every worker of the deployment
+MIGRATION_LOCK_ID = 7_310_042
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    # The URL may come from .env rather than the environment env.py reads; % is configparser syntax
+    config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+    return config
+
+
+def _current_heads(connection) -> set:
+    from alembic.runtime.migration import MigrationContext
+
+    return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def upgrade_if_needed() -> Optional[Tuple[set, set]]:
+    """Upgrade to head when the database is behind; returns (from, to) revisions, or None when current"""
+    # alembic is only imported here, and only in workers that check migrations at all
+    from alembic import command
+    from alembic.script import ScriptDirectory
+
+    config = _alembic_config()
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    with engine.connect() as connection:
+        if _current_heads(connection) == heads:
+            return None
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        # Another worker may have finished the upgrade while we waited for the lock
+        current = _current_heads(connection)
+        if current == heads:
+            return None
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+        connection.commit()
+    logger.info(f"Migrated database from {sorted(current) or 'empty'} to {sorted(heads)}")
+    return current, heads
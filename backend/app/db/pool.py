@@ -0,0 +1,134 @@
+"""Connection pool configuration and live pool metrics.
+
+Both engines get their sizing, recycling, LIFO mode, statement timeout and
+liveness check from Settings (DB_*). Their pools are QueuePool subclasses that
+time every checkout, so /stats/db-pool can report how long requests wait for
+a connection, not only how many are in use.
+
+DB_POOL_PING chooses the liveness check on checkout: "always" is SQLAlchemy's
+pre-ping (one round trip per checkout), "idle" pings only connections that sat
+unused for DB_POOL_PING_IDLE seconds, where a server or proxy timeout may have
+dropped them, and "never" relies on DB_POOL_RECYCLE alone.
+"""
+import bisect
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+# Upper bounds (ms) of the checkout wait histogram; the last bucket is unbounded
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.ping_failures = 0
+        self.max_wait_ms = 0.0
+        self.total_wait_ms = 0.0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def observe_wait(self, wait_ms: float) -> None:
+        self.checkouts += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.wait_counts[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    def histogram(self) -> dict:
+        """Cumulative counts per upper bound, as in a Prometheus histogram"""
+        cumulative, total = {}, 0
+        for bound, count in zip(WAIT_BUCKETS_MS + ("+Inf",), self.wait_counts):
+            total += count
+            cumulative[str(bound)] = total
+        return cumulative
+
+
+def _timed_pool(base: type, metrics: PoolMetrics) -> type:
+    # A subclass per engine: Pool.recreate() (e.g. on dispose) builds the same class, keeping the metrics
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.timeouts += 1
+                raise
+            metrics.observe_wait((time.perf_counter() - started) * 1000)
+            return connection
+
+    TimedPool.metrics = metrics
+    return TimedPool
+
+
+def _statement_timeout_args(url: str) -> dict:
+    ms = settings.DB_STATEMENT_TIMEOUT_MS
+    if not ms or make_url(url).get_backend_name() != "postgresql":
+        return {}
+    if make_url(url).get_driver_name() == "asyncpg":
+        return {"server_settings": {"statement_timeout": str(ms)}}
+    return {"options": f"-c statement_timeout={ms}"}
+
+
+def engine_options(url: str, asyncio: bool = False) -> dict:
+    """Keyword arguments for create_engine / create_async_engine"""
+    options = dict(
+        poolclass=_timed_pool(AsyncAdaptedQueuePool if asyncio else QueuePool, PoolMetrics()),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_use_lifo=settings.DB_POOL_LIFO,
+        pool_pre_ping=settings.DB_POOL_PING == "always",
+    )
+    connect_args = _statement_timeout_args(url)
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def install_idle_ping(engine) -> None:
+    """With DB_POOL_PING="idle", ping only connections idle for more than DB_POOL_PING_IDLE seconds"""
+    if settings.DB_POOL_PING != "idle":
+        return
+    sync_engine = getattr(engine, "sync_engine", engine)
+    metrics = sync_engine.pool.metrics
+
+    @event.listens_for(sync_engine, "checkin")
+    def _stamp(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < settings.DB_POOL_PING_IDLE:
+            return
+        try:
+            alive = sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            alive = False
+        if not alive:
+            metrics.ping_failures += 1
+            # The pool discards this connection and retries the checkout with a fresh one
+            raise exc.DisconnectionError()
+
+
+def pool_stats(engine) -> dict:
+    pool = getattr(engine, "sync_engine", engine).pool
+    metrics = pool.metrics
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "ping_failures": metrics.ping_failures,
+        "avg_wait_ms": round(metrics.total_wait_ms / metrics.checkouts, 3) if metrics.checkouts else 0.0,
+        "max_wait_ms": round(metrics.max_wait_ms, 3),
+        "wait_ms_histogram": metrics.histogram(),
+    }
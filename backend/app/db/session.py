@@ -1,16 +1,68 @@
 # app/db/session.py
+import asyncio
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool import engine_options, install_idle_ping
+from app.core.metrics import instrument_engine
+from app.core import sql_profiler
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+install_idle_ping(engine)
+instrument_engine(engine, "sync")
+if settings.SQL_PROFILER:
+    sql_profiler.install(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+def async_database_url(url: str) -> str:
+    """Map DATABASE_URL onto its asyncio driver: asyncpg for Postgres, aiosqlite for SQLite"""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "postgresql":
+        # asyncpg takes `ssl` instead of libpq's `sslmode` and has no channel_binding option
+        query = dict(u.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode and sslmode != "disable":
+            query["ssl"] = sslmode
+        u = u.set(drivername="postgresql+asyncpg", query=query)
+    elif backend == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+    return u.render_as_string(hide_password=False)
+
+
+async_engine = create_async_engine(async_database_url(settings.DATABASE_URL),
+                                   **engine_options(async_database_url(settings.DATABASE_URL), asyncio=True))
+install_idle_ping(async_engine)
+instrument_engine(async_engine, "async")
+if settings.SQL_PROFILER:
+    sql_profiler.install(async_engine)
+# expire_on_commit=False: an AsyncSession cannot implicitly reload attributes expired by a commit
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def warm_async_pool(connections: int) -> None:
+    """Open `connections` pooled connections up front so the first requests skip connection setup"""
+    async def ping():
+        async with async_engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+    # Concurrently, so each ping holds its own connection
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,98 @@
+"""Unit of work: one transaction and one COMMIT per API call.
+
+Repository writes commit on their own by default. While a unit of work is open
+on their session they only flush (and only when the caller needs generated ids),
+and the outermost unit commits everything on exit or rolls it all back if an
+exception escapes, so a failed activity-log insert cannot leave a half-written
+task behind.
+
+Units nest: only the outermost one commits or rolls back. The open depth lives
+in ``session.info`` so repositories and services built on the same session
+all see it. Work that must only happen once the data is durable, such as
+handing activity events to the write-behind writer, is registered with
+``after_commit``.
+"""
+import inspect
+
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_DEPTH_KEY = "unit_of_work_depth"
+_AFTER_COMMIT_KEY = "unit_of_work_after_commit"
+
+
+def in_unit_of_work(db) -> bool:
+    """True while a (sync or async) unit of work is open on the session"""
+    return db.info.get(_DEPTH_KEY, 0) > 0
+
+
+def after_commit(db, callback) -> None:
+    """Run `callback()` once the outermost unit open on `db` commits; it is dropped on rollback.
+    Under AsyncUnitOfWork the callback may return an awaitable."""
+    db.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+
+
+def _enter(db) -> None:
+    db.info[_DEPTH_KEY] = db.info.get(_DEPTH_KEY, 0) + 1
+
+
+def _exit(db) -> bool:
+    """Close one level; True when this was the outermost unit"""
+    db.info[_DEPTH_KEY] -= 1
+    return db.info[_DEPTH_KEY] == 0
+
+
+class UnitOfWork:
+    """``with UnitOfWork(db): ...`` commits once on success, rolls back on error"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def __enter__(self) -> "UnitOfWork":
+        _enter(self.db)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if not _exit(self.db):
+            return False
+        callbacks = self.db.info.pop(_AFTER_COMMIT_KEY, [])
+        if exc_type is None:
+            try:
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            for callback in callbacks:
+                callback()
+        else:
+            self.db.rollback()
+        return False
+
+
+class AsyncUnitOfWork:
+    """asyncio variant of UnitOfWork: ``async with AsyncUnitOfWork(db): ...``"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def __aenter__(self) -> "AsyncUnitOfWork":
+        _enter(self.db)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if not _exit(self.db):
+            return False
+        callbacks = self.db.info.pop(_AFTER_COMMIT_KEY, [])
+        if exc_type is None:
+            try:
+                await self.db.commit()
+            except Exception:
+                await self.db.rollback()
+                raise
+            for callback in callbacks:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+        else:
+            await self.db.rollback()
+        return False
@@ -1,31 +1,104 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from app.core.startup import startup_timer
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.session import engine, Base
-import subprocess
+from starlette.concurrency import run_in_threadpool
+from app.db.session import engine, Base, warm_async_pool
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, registry
+from app.core.sql_profiler import SQLProfilerMiddleware, recent_reports
 import logging
 
 logger = logging.getLogger(__name__)
+startup_timer.mark("import framework")
 
 app = FastAPI(title="Task Management System")
 
 @app.on_event("startup")
 async def run_migrations():
-    """Run alembic migrations on startup"""
-    try:
-        logger.info("Running database migrations...")
-        result = subprocess.run(
-            ["alembic", "upgrade", "head"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        logger.info(f"Migrations completed successfully: {result.stdout}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Migration failed: {e.stderr}")
-        # Don't raise - let app start anyway, tables might already exist
-    except Exception as e:
-        logger.error(f"Unexpected error during migration: {str(e)}")
+    """Bring the schema up to date per STARTUP_MIGRATIONS ("auto" or "never")"""
+    if settings.STARTUP_MIGRATIONS == "never":
+        return
+    with startup_timer.phase("migrations"):
+        try:
+            from app.db.migrate import upgrade_if_needed
+            await run_in_threadpool(upgrade_if_needed)
+        except Exception as e:
+            logger.error(f"Migration failed: {str(e)}")
+            # Don't raise - let app start anyway; create whatever tables are missing
+            await run_in_threadpool(Base.metadata.create_all, bind=engine)
+
+
+@app.on_event("startup")
+async def warm_db_pool():
+    with startup_timer.phase("warm db pool"):
+        try:
+            await warm_async_pool(settings.STARTUP_WARM_CONNECTIONS)
+        except Exception as e:
+            logger.error(f"Could not pre-open database connections: {str(e)}")
+
+
+@app.on_event("startup")
+async def start_activity_writer():
+    if settings.ACTIVITY_WRITE_BEHIND:
+        with startup_timer.phase("activity writer"):
+            await activity_writer.start()
+
+
+@app.on_event("shutdown")
+async def stop_activity_writer():
+    # Drain buffered activity events before the process exits
+    await activity_writer.stop()
+
+
+@app.on_event("startup")
+async def start_password_hasher():
+    with startup_timer.phase("hashing pool"):
+        password_hasher.start()
+
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+
+
+@app.on_event("startup")
+async def start_change_broker():
+    from app.services.task_service import async_redis_client
+    with startup_timer.phase("change broker"):
+        await change_broker.start(async_redis_client if settings.STREAM_REDIS_FANOUT else None)
+
+
+@app.on_event("shutdown")
+async def stop_change_broker():
+    await change_broker.stop()
+
+
+@app.on_event("startup")
+async def start_invalidation_bus():
+    from app.services.task_service import async_redis_client
+    with startup_timer.phase("cache invalidation bus"):
+        await invalidation_bus.start(async_redis_client)
+
+
+@app.on_event("shutdown")
+async def stop_invalidation_bus():
+    await invalidation_bus.stop()
+
+
+@app.on_event("startup")
+async def start_due_scheduler():
+    if settings.SCHEDULER_ENABLED:
+        from app.services.task_service import async_redis_client
+        with startup_timer.phase("due scheduler"):
+            due_scheduler.add_listener(mail_overdue_digests)
+            await due_scheduler.start(async_redis_client)
+
+
+@app.on_event("shutdown")
+async def stop_due_scheduler():
+    await due_scheduler.stop()
+
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -52,11 +125,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+if settings.SQL_PROFILER:
+    app.add_middleware(SQLProfilerMiddleware)
 
-# Import routes AFTER creating tables
+# Added last, so it is the outermost layer: latency includes CORS handling and errors turned into 500s
+app.add_middleware(MetricsMiddleware)
+
+# Schema creation happens in the run_migrations startup hook, not at import time
 from app.api.routes import tasks, auth, labels, activity, notifications, comments
+from app.services.activity_writer import activity_writer
+from app.services.due_scheduler import due_scheduler
+from app.services.change_stream import change_broker
+from app.core.hashing import password_hasher
+from app.core.tiered_cache import invalidation_bus
+from app.api.routes.notifications import mail_overdue_digests
+from app.api.routes.auth import authorize_metrics_scrape, get_current_admin
 
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(tasks.router, prefix="/api/v1")
@@ -64,6 +147,10 @@ app.include_router(labels.router, prefix="/api/v1")
 app.include_router(activity.router, prefix="/api/v1")
 app.include_router(notifications.router, prefix="/api/v1")
 app.include_router(comments.router, prefix="/api/v1")
+startup_timer.mark("import routes")
+
+# Diagnostics expose pool sizes, cache state, worker identity and lease state: admins only
+admin_only = [Depends(get_current_admin)]
 
 
 @app.get("/")
@@ -75,6 +162,70 @@ def root():
 def health():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(authorize_metrics_scrape)])
+def metrics():
+    """Prometheus text exposition of the request, SQL, cache and SMTP metrics (admins, or METRICS_TOKEN)"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/auth-cache", dependencies=admin_only)
+def auth_cache_stats():
+    """Hit/miss counters of the principal cache used by get_current_user"""
+    from app.core.auth_cache import principal_cache
+    return principal_cache.stats()
+
+@app.get("/stats/task-cache", dependencies=admin_only)
+def task_cache_stats():
+    """Hit, stale-serve, coalescing and lock counters of the task list and stats caches, and task snapshot hits"""
+    from app.services.task_service import task_list_cache, task_stats_cache
+    from app.services.task_snapshots import task_snapshots
+    return {"list": task_list_cache.stats(), "stats": task_stats_cache.stats(), "snapshots": task_snapshots.stats()}
+
+@app.get("/stats/caches", dependencies=admin_only)
+def cache_stats():
+    """Per-tier hit rates of the two-tier caches, and the invalidation bus of this worker"""
+    from app.core.auth_cache import principal_store
+    from app.api.routes.labels import label_list_cache
+    return {"labels": label_list_cache.stats(), "principal": principal_store.stats(), "bus": invalidation_bus.stats()}
+
+@app.get("/stats/activity-writer", dependencies=admin_only)
+def activity_writer_stats():
+    """Queue depth and flush latency of the write-behind activity log"""
+    return activity_writer.stats()
+
+@app.get("/stats/scheduler", dependencies=admin_only)
+def scheduler_stats():
+    """Leadership, heap size and fired count of the due-date scheduler"""
+    return due_scheduler.stats()
+
+@app.get("/stats/stream", dependencies=admin_only)
+def stream_stats():
+    """Open /tasks/stream connections and event counters of this worker"""
+    return change_broker.stats()
+
+@app.get("/stats/hashing", dependencies=admin_only)
+def hashing_stats():
+    """Queue depth, queue time and load-shed count of the password hashing pool"""
+    return password_hasher.stats()
+
+@app.get("/stats/db-pool", dependencies=admin_only)
+def db_pool_stats():
+    """Live connection pool usage and checkout wait times of both engines"""
+    from app.db.pool import pool_stats
+    from app.db.session import async_engine
+    return {"async": pool_stats(async_engine), "sync": pool_stats(engine)}
+
+if settings.SQL_PROFILER:
+    # Request paths and statement shapes; mounted only where the profiler runs
+    @app.get("/stats/sql-profile", dependencies=admin_only)
+    def sql_profile_stats(flagged: bool = False):
+        """Recent per-request SQL reports, newest first; flagged=true keeps only likely N+1s"""
+        return {"reports": [r for r in reversed(recent_reports) if r["repeated"] or not flagged]}
+
+@app.get("/stats/startup", dependencies=admin_only)
+def startup_stats():
+    """How long this worker took to boot, phase by phase"""
+    return startup_timer.report()
+
 @app.get("/version")
 def version():
     return {"version": "1.1.0", "deployed_at": "2025-12-04_00:15_FIXED_BCRYPT"}
@@ -83,4 +234,10 @@ def version():
 async def favicon():
     """Return 204 No Content for favicon requests to prevent 404 errors"""
     from fastapi.responses import Response
-    return Response(status_code=204)
\ No newline at end of file
+    return Response(status_code=204)
+
+
+@app.on_event("startup")
+async def startup_complete():
+    # Registered last, so it runs after every other startup hook
+    startup_timer.finish()
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.session import Base
@@ -30,6 +30,11 @@ class Comment(Base):
     task = relationship("Task", back_populates="comments")
     user = relationship("User", back_populates="comments")
 
+    __table_args__ = (
+        Index("ix_comments_task_created", "task_id", "created_at"),
+        Index("ix_comments_user_created", "user_id", "created_at"),
+    )
+
 
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
@@ -43,3 +48,8 @@ class ActivityLog(Base):
     
     task = relationship("Task", back_populates="activity_logs")
     user = relationship("User", back_populates="activity_logs")
+
+    __table_args__ = (
+        Index("ix_activity_logs_user_created", "user_id", "created_at"),
+        Index("ix_activity_logs_task_created", "task_id", "created_at"),
+    )
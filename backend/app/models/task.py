@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Enum, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Enum, ForeignKey, Table, Index, event, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from app.db.session import Base
+from app.db import fulltext
 
 
 class TaskStatus(str, enum.Enum):
@@ -22,7 +23,9 @@ task_labels = Table(
     'task_labels',
     Base.metadata,
     Column('task_id', Integer, ForeignKey('tasks.id', ondelete='CASCADE'), primary_key=True),
-    Column('label_id', Integer, ForeignKey('labels.id', ondelete='CASCADE'), primary_key=True)
+    Column('label_id', Integer, ForeignKey('labels.id', ondelete='CASCADE'), primary_key=True),
+    # The primary key serves task -> labels; this serves label -> tasks
+    Index('ix_task_labels_label_task', 'label_id', 'task_id'),
 )
 
 
@@ -37,6 +40,8 @@ class Task(Base):
     due_date = Column(DateTime, nullable=True, index=True)
     is_deleted = Column(Boolean, default=False, index=True)
     deleted_at = Column(DateTime, nullable=True)
+    # Ledger of the overdue digest: set when the owner was mailed about this task. A later due_date re-arms it.
+    overdue_notified_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -44,4 +49,16 @@ class Task(Base):
     owner = relationship("User", back_populates="tasks")
     labels = relationship("Label", secondary=task_labels, back_populates="tasks")
     comments = relationship("Comment", back_populates="task", cascade="all, delete-orphan")
-    activity_logs = relationship("ActivityLog", back_populates="task", cascade="all, delete-orphan")
\ No newline at end of file
+    activity_logs = relationship("ActivityLog", back_populates="task", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Calendar windows: one index range scan per user and date range
+        Index("ix_tasks_owner_deleted_due", "owner_id", "is_deleted", "due_date"),
+        # Default listing (owner, newest first); B-tree indexes scan backwards, so DESC needs no separate index
+        Index("ix_tasks_owner_created_live", "owner_id", "created_at", "id",
+              postgresql_where=text("is_deleted = false"), sqlite_where=text("is_deleted = 0")),
+    )
+
+
+# Full-text index (tsvector/FTS5) is not mapped; it is maintained by the database itself
+event.listen(Task.__table__, "after_create", fulltext.after_tasks_create)
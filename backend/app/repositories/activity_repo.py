@@ -1,8 +1,10 @@
 
 from typing import List
+from sqlalchemy import select, insert
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.label import ActivityLog
-from app.repositories.base import BaseRepository
+from app.repositories.base import BaseRepository, AsyncBaseRepository
 
 class ActivityRepository(BaseRepository[ActivityLog]):
     def __init__(self, db: Session):
@@ -10,3 +12,17 @@ class ActivityRepository(BaseRepository[ActivityLog]):
 
     def get_by_user(self, user_id: int, skip: int = 0, limit: int = 50) -> List[ActivityLog]:
         return self.db.query(ActivityLog).filter(ActivityLog.user_id == user_id).order_by(ActivityLog.created_at.desc()).offset(skip).limit(limit).all()
+
+
+class AsyncActivityRepository(AsyncBaseRepository[ActivityLog]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(ActivityLog, db)
+
+    async def get_by_user(self, user_id: int, skip: int = 0, limit: int = 50) -> List[ActivityLog]:
+        result = await self.db.execute(select(ActivityLog).where(ActivityLog.user_id == user_id).order_by(ActivityLog.created_at.desc()).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    async def bulk_create(self, rows: List[dict]) -> None:
+        """Multi-row INSERT of activity logs. Never commits; run it inside a unit of work."""
+        if rows:
+            await self.db.execute(insert(ActivityLog), rows)
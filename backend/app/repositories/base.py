@@ -1,7 +1,10 @@
 
 from typing import Generic, TypeVar, Type, Optional, List
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import Base
+from app.db.unit_of_work import in_unit_of_work
 
 ModelType = TypeVar("ModelType", bound=Base)
 
@@ -17,28 +20,85 @@ class BaseRepository(Generic[ModelType]):
     def get_multi(self, skip: int = 0, limit: int = 100) -> List[ModelType]:
         return self.db.query(self.model).offset(skip).limit(limit).all()
 
+    def _commit(self, db_obj: Optional[ModelType] = None) -> None:
+        """Commit and reload `db_obj`, unless a unit of work is open; its single commit then covers this write"""
+        if in_unit_of_work(self.db):
+            return
+        self.db.commit()
+        if db_obj is not None:
+            self.db.refresh(db_obj)
+
     def create(self, obj_in: dict) -> ModelType:
         db_obj = self.model(**obj_in)
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        # Flush so the caller gets the primary key even before the commit
+        self.db.flush()
+        self._commit(db_obj)
         return db_obj
 
     def update(self, db_obj: ModelType, obj_in: dict) -> ModelType:
         for field, value in obj_in.items():
             if value is not None:
                 setattr(db_obj, field, value)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        self._commit(db_obj)
         return db_obj
 
     def delete(self, id: int) -> bool:
         obj = self.get(id)
         if obj:
             self.db.delete(obj)
-            self.db.commit()
+            self._commit()
             return True
         return False
 
     def count(self) -> int:
         return self.db.query(self.model).count()
+
+
+class AsyncBaseRepository(Generic[ModelType]):
+    """asyncio variant of BaseRepository for use with an AsyncSession"""
+
+    def __init__(self, model: Type[ModelType], db: AsyncSession):
+        self.model = model
+        self.db = db
+
+    async def get(self, id: int) -> Optional[ModelType]:
+        result = await self.db.execute(select(self.model).where(self.model.id == id))
+        return result.scalars().first()
+
+    async def get_multi(self, skip: int = 0, limit: int = 100) -> List[ModelType]:
+        result = await self.db.execute(select(self.model).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    async def _commit(self, db_obj: Optional[ModelType] = None) -> None:
+        if in_unit_of_work(self.db):
+            return
+        await self.db.commit()
+        if db_obj is not None:
+            await self.db.refresh(db_obj)
+
+    async def create(self, obj_in: dict) -> ModelType:
+        db_obj = self.model(**obj_in)
+        self.db.add(db_obj)
+        await self.db.flush()
+        await self._commit(db_obj)
+        return db_obj
+
+    async def update(self, db_obj: ModelType, obj_in: dict) -> ModelType:
+        for field, value in obj_in.items():
+            if value is not None:
+                setattr(db_obj, field, value)
+        await self._commit(db_obj)
+        return db_obj
+
+    async def delete(self, id: int) -> bool:
+        obj = await self.get(id)
+        if obj:
+            await self.db.delete(obj)
+            await self._commit()
+            return True
+        return False
+
+    async def count(self) -> int:
+        result = await self.db.execute(select(func.count()).select_from(self.model))
+        return result.scalar_one()
@@ -1,7 +1,9 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.models.label import Comment
-from app.repositories.base import BaseRepository
+from app.repositories.base import BaseRepository, AsyncBaseRepository
 
 
 class CommentRepository(BaseRepository[Comment]):
@@ -13,3 +15,16 @@ class CommentRepository(BaseRepository[Comment]):
     
     def get_by_user(self, user_id: int) -> List[Comment]:
         return self.db.query(Comment).filter(Comment.user_id == user_id).order_by(Comment.created_at.desc()).all()
+
+
+class AsyncCommentRepository(AsyncBaseRepository[Comment]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(Comment, db)
+    
+    async def get_by_task(self, task_id: int) -> List[Comment]:
+        result = await self.db.execute(select(Comment).where(Comment.task_id == task_id).order_by(Comment.created_at.desc()))
+        return list(result.scalars().all())
+    
+    async def get_by_user(self, user_id: int) -> List[Comment]:
+        result = await self.db.execute(select(Comment).where(Comment.user_id == user_id).order_by(Comment.created_at.desc()))
+        return list(result.scalars().all())
@@ -1,8 +1,11 @@
 
 from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.label import Label
-from app.repositories.base import BaseRepository
+from app.models.task import Task, task_labels
+from app.repositories.base import BaseRepository, AsyncBaseRepository
 
 class LabelRepository(BaseRepository[Label]):
     def __init__(self, db: Session):
@@ -10,3 +13,30 @@ class LabelRepository(BaseRepository[Label]):
 
     def get_by_owner(self, owner_id: int, skip: int = 0, limit: int = 100) -> List[Label]:
         return self.db.query(Label).filter(Label.created_by == owner_id).offset(skip).limit(limit).all()
+
+
+class AsyncLabelRepository(AsyncBaseRepository[Label]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(Label, db)
+
+    async def get_by_owner(self, owner_id: int, skip: int = 0, limit: int = 100) -> List[Label]:
+        result = await self.db.execute(select(Label).where(Label.created_by == owner_id).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    async def get_many(self, ids: List[int]) -> List[Label]:
+        result = await self.db.execute(select(Label).where(Label.id.in_(ids)))
+        return list(result.scalars().all())
+
+    async def existing_ids(self, ids: List[int]) -> set:
+        if not ids:
+            return set()
+        result = await self.db.execute(select(Label.id).where(Label.id.in_(ids)))
+        return set(result.scalars().all())
+
+    async def tagged_tasks(self, label_id: int) -> List[tuple]:
+        """(task_id, owner_id) of the tasks carrying the label"""
+        result = await self.db.execute(
+            select(Task.id, Task.owner_id).join(task_labels, task_labels.c.task_id == Task.id)
+            .where(task_labels.c.label_id == label_id)
+        )
+        return [tuple(row) for row in result.all()]
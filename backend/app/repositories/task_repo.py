@@ -1,92 +1,345 @@
-
 from typing import Optional, List
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from datetime import datetime
-from app.models.task import Task, TaskStatus, TaskPriority
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, func, case, literal_column, select, insert, update, delete
+from datetime import datetime, timedelta
+from app.db import fulltext
+from app.models.task import Task, TaskStatus, TaskPriority, task_labels
 from app.models.label import Label
-from app.repositories.base import BaseRepository
+from app.repositories.base import AsyncBaseRepository
 
+PRIORITY_RANK = {TaskPriority.HIGH: 3, TaskPriority.MEDIUM: 2, TaskPriority.LOW: 1}
 
-class TaskRepository(BaseRepository[Task]):
-    def __init__(self, db: Session):
-        super().__init__(Task, db)
 
-    def get_by_owner(self, owner_id: int, skip: int = 0, limit: int = 100, include_deleted: bool = False) -> List[Task]:
-        query = self.db.query(Task).filter(Task.owner_id == owner_id)
-        if not include_deleted:
-            query = query.filter(Task.is_deleted == False)
-        return query.offset(skip).limit(limit).all()
 
-    def search_tasks(self, owner_id: int, search: Optional[str] = None, status: Optional[TaskStatus] = None,
-                     priority: Optional[TaskPriority] = None, label_ids: Optional[List[int]] = None,
-                     overdue_only: bool = False, skip: int = 0, limit: int = 100,
-                     sort_by: str = "created_at", sort_order: str = "desc") -> tuple[List[Task], int]:
-        query = self.db.query(Task).filter(and_(Task.owner_id == owner_id, Task.is_deleted == False))
+class TaskLoad:
+    """Eager-loading profiles for task queries, chosen per endpoint.
+
+    Each profile is a tuple of (relationship name, loader). Lists use selectinload so
+    a page costs one extra query per relationship regardless of its size; a single
+    task can afford a JOIN for its labels. Collections are never joined together,
+    which would multiply comments by activity rows.
+    """
+    NONE = ()
+    LIST = (("labels", selectinload), ("comments", selectinload), ("activity_logs", selectinload))
+    DETAIL = (("labels", joinedload), ("comments", selectinload), ("activity_logs", selectinload))
+
+
+def task_loader_options(load: tuple) -> list:
+    return [loader(getattr(Task, relationship)) for relationship, loader in load]
+
+
+class TaskQueries:
+    """Statement builders of AsyncTaskRepository; session-free, so benchmarks/query_plans.py can EXPLAIN them"""
 
+    dialect_name: str
+
+    def _filtered_statement(self, owner_id: int, search: Optional[str] = None, status: Optional[TaskStatus] = None,
+                            priority: Optional[TaskPriority] = None, label_ids: Optional[List[int]] = None,
+                            overdue_only: bool = False):
+        """Base listing statement plus the relevance expression (None unless searching)"""
+        stmt = select(Task).where(and_(Task.owner_id == owner_id, Task.is_deleted == False))
+
+        rank = None
         if search:
-            query = query.filter(or_(Task.title.ilike(f"%{search}%"), Task.description.ilike(f"%{search}%")))
+            stmt, rank = self._apply_search(stmt, search)
 
         if status:
-            query = query.filter(Task.status == status)
+            stmt = stmt.where(Task.status == status)
 
         if priority:
-            query = query.filter(Task.priority == priority)
+            stmt = stmt.where(Task.priority == priority)
 
         if label_ids:
-            query = query.join(Task.labels).filter(Label.id.in_(label_ids))
+            stmt = stmt.where(Task.labels.any(Label.id.in_(label_ids)))
 
         if overdue_only:
-            query = query.filter(and_(Task.due_date < datetime.utcnow(), Task.status != TaskStatus.COMPLETED))
+            stmt = stmt.where(and_(Task.due_date < datetime.utcnow(), Task.status != TaskStatus.COMPLETED))
+
+        return stmt, rank
 
-        # Sorting logic
+    def _apply_search(self, stmt, search: str):
+        """Filter through the full-text index and return (stmt, rank); higher rank is more relevant"""
+        terms = fulltext.search_terms(search)
+        if terms and self.dialect_name == "postgresql":
+            tsquery = func.to_tsquery("english", fulltext.postgres_query(terms))
+            search_vector = literal_column("tasks.search_vector")
+            return stmt.where(search_vector.op("@@")(tsquery)), func.ts_rank_cd(search_vector, tsquery)
+        if terms and self.dialect_name == "sqlite":
+            fts = fulltext.TASKS_FTS
+            stmt = stmt.join(fts, fts.c.rowid == Task.id).where(
+                literal_column("tasks_fts").op("MATCH")(fulltext.sqlite_query(terms)))
+            # FTS5 rank is bm25, where lower is better
+            return stmt, -fts.c.rank
+
+        # No index on other backends, and no index terms in a search of only punctuation or symbols
+        # (e.g. "#", "--"); fall back to substring matching rather than returning everything
+        return stmt.where(or_(Task.title.ilike(f"%{search}%"), Task.description.ilike(f"%{search}%"))), None
+
+    @staticmethod
+    def _sort_keys(sort_by: str, sort_order: str, rank=None) -> list:
+        """(expression, ascending) pairs that totally order a listing; the last key is always Task.id"""
+        ascending = sort_order == "asc"
+        if sort_by == "relevance" and rank is not None:
+            return [(rank, ascending), (Task.id, ascending)]
         if sort_by == "priority":
-            from sqlalchemy import case
             priority_order = case(
                 (Task.priority == TaskPriority.HIGH, 3),
                 (Task.priority == TaskPriority.MEDIUM, 2),
                 (Task.priority == TaskPriority.LOW, 1),
                 else_=0
             )
-            if sort_order == "asc":
-                query = query.order_by(priority_order.asc())
-            else:
-                query = query.order_by(priority_order.desc())
-        elif sort_by == "due_date":
-            if sort_order == "asc":
-                query = query.order_by(Task.due_date.asc().nulls_last())
-            else:
-                query = query.order_by(Task.due_date.desc().nulls_last())
-        else:  # Default to created_at
-            if sort_order == "asc":
-                query = query.order_by(Task.created_at.asc())
-            else:
-                query = query.order_by(Task.created_at.desc())
-
-        total = query.count()
-        tasks = query.offset(skip).limit(limit).all()
-        return tasks, total
-
-    def soft_delete(self, task_id: int) -> Optional[Task]:
-        task = self.get(task_id)
+            return [(priority_order, ascending), (Task.id, ascending)]
+        if sort_by == "due_date":
+            # Tasks without a due date go last in both directions
+            due_date_missing = case((Task.due_date.is_(None), 1), else_=0)
+            return [(due_date_missing, True), (Task.due_date, ascending), (Task.id, ascending)]
+        # Default to created_at
+        return [(Task.created_at, ascending), (Task.id, ascending)]
+
+    @staticmethod
+    def sort_values(task: Task, sort_by: str) -> list:
+        """Values of a task for the keys returned by _sort_keys, used to build cursors"""
+        if sort_by == "relevance":
+            return [getattr(task, "search_rank", 0.0), task.id]
+        if sort_by == "priority":
+            return [PRIORITY_RANK.get(task.priority, 0), task.id]
+        if sort_by == "due_date":
+            return [1 if task.due_date is None else 0, task.due_date, task.id]
+        return [task.created_at, task.id]
+
+    @staticmethod
+    def _order_by(stmt, keys: list):
+        return stmt.order_by(*[expr.asc() if ascending else expr.desc() for expr, ascending in keys])
+
+    @staticmethod
+    def _after(keys: list, values: list):
+        """Rows strictly after `values` in the ordering given by `keys` (row-value comparison that tolerates NULLs)"""
+        clauses = []
+        for i, ((expr, ascending), value) in enumerate(zip(keys, values)):
+            if value is None:
+                continue
+            prefix = [e.is_(None) if v is None else e == v for (e, _), v in zip(keys[:i], values[:i])]
+            clauses.append(and_(*prefix, expr > value if ascending else expr < value))
+        return or_(*clauses)
+
+    def _listing_statements(self, owner_id: int, search: Optional[str] = None, status: Optional[TaskStatus] = None,
+                            priority: Optional[TaskPriority] = None, label_ids: Optional[List[int]] = None,
+                            overdue_only: bool = False, skip: int = 0, limit: int = 100,
+                            sort_by: str = "created_at", sort_order: str = "desc",
+                            keyset: Optional[list] = None, direction: str = "next", load: tuple = TaskLoad.LIST):
+        """(count statement, page statement, ranked) for an offset page, or for the page after a keyset position"""
+        stmt, rank = self._filtered_statement(owner_id, search, status, priority, label_ids, overdue_only)
+        count_stmt = select(func.count()).select_from(stmt.subquery())
+
+        keys = self._sort_keys(sort_by, sort_order, rank)
+        if keyset is not None:
+            if direction == "prev":
+                keys = [(expr, not ascending) for expr, ascending in keys]
+            stmt = stmt.where(self._after(keys, keyset))
+            skip = 0
+
+        ranked = sort_by == "relevance" and rank is not None
+        if ranked:
+            stmt = stmt.add_columns(rank.label("search_rank"))
+        stmt = self._order_by(stmt, keys).offset(skip).limit(limit).options(*task_loader_options(load))
+        return count_stmt, stmt, ranked
+
+    @staticmethod
+    def _tasks_from_rows(result, ranked: bool) -> List[Task]:
+        """Unpack a listing result; when ranking, the score is kept on each task as `search_rank`"""
+        # unique() is required once a collection is joinedload-ed
+        result = result.unique()
+        if not ranked:
+            return list(result.scalars().all())
+        tasks = []
+        for task, search_rank in result.all():
+            task.search_rank = search_rank
+            tasks.append(task)
+        return tasks
+
+    @staticmethod
+    def _keyset_page(rows: List[Task], limit: int, direction: str) -> tuple[List[Task], bool]:
+        has_more = len(rows) > limit
+        tasks = rows[:limit]
+        if direction == "prev":
+            tasks.reverse()
+        return tasks, has_more
+
+    @staticmethod
+    def _get_statement(id: int, load: tuple):
+        return select(Task).where(Task.id == id).options(*task_loader_options(load))
+
+    @staticmethod
+    def _get_many_statement(ids: List[int], load: tuple):
+        return select(Task).where(Task.id.in_(ids)).options(*task_loader_options(load))
+
+    @staticmethod
+    def _in_order(tasks, ids: List[int]) -> List[Task]:
+        # SQL IN doesn't guarantee order; missing ids are skipped
+        task_map = {t.id: t for t in tasks}
+        return [task_map[tid] for tid in ids if tid in task_map]
+
+    @staticmethod
+    def _stats_statements(owner_id: int, now: datetime):
+        """Dashboard aggregates over the user's live tasks: one FILTER aggregate for the
+        status/priority/due-date counts and one GROUP BY for the per-label counts"""
+        live = and_(Task.owner_id == owner_id, Task.is_deleted == False)
+        still_open = Task.status != TaskStatus.COMPLETED
+        week_end = now + timedelta(days=7)
+        columns = [func.count().label("total")]
+        columns += [func.count().filter(Task.status == s).label(f"status_{s.value}") for s in TaskStatus]
+        columns += [func.count().filter(Task.priority == p).label(f"priority_{p.value}") for p in TaskPriority]
+        columns += [
+            func.count().filter(and_(still_open, Task.due_date < now)).label("overdue"),
+            func.count().filter(and_(still_open, Task.due_date >= now, Task.due_date < week_end)).label("due_this_week"),
+        ]
+        totals = select(*columns).where(live)
+
+        label_count = func.count().label("count")
+        per_label = (
+            select(Label.id, Label.name, Label.color, label_count)
+            .select_from(task_labels)
+            .join(Task, Task.id == task_labels.c.task_id)
+            .join(Label, Label.id == task_labels.c.label_id)
+            .where(live)
+            .group_by(Label.id, Label.name, Label.color)
+            .order_by(label_count.desc(), Label.id)
+        )
+        return totals, per_label
+
+    @staticmethod
+    def _stats_from_rows(totals, label_rows) -> dict:
+        return {
+            "total": totals.total,
+            "by_status": {s.value: getattr(totals, f"status_{s.value}") for s in TaskStatus},
+            "by_priority": {p.value: getattr(totals, f"priority_{p.value}") for p in TaskPriority},
+            "overdue": totals.overdue,
+            "due_this_week": totals.due_this_week,
+            "by_label": [{"label_id": row.id, "name": row.name, "color": row.color, "count": row.count}
+                         for row in label_rows],
+        }
+
+    @staticmethod
+    def _calendar_statement(owner_id: int, start: datetime, end: datetime, limit: int):
+        """Summary columns of tasks due in [start, end), an index range scan on ix_tasks_owner_deleted_due"""
+        return (
+            select(Task.id, Task.title, Task.status, Task.priority, Task.due_date)
+            .where(Task.owner_id == owner_id, Task.is_deleted == False,
+                   Task.due_date >= start, Task.due_date < end)
+            .order_by(Task.due_date, Task.id)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def _overdue_statement(owner_id: int):
+        return select(Task).where(
+            and_(Task.owner_id == owner_id, Task.is_deleted == False,
+                 Task.due_date < datetime.utcnow(), Task.status != TaskStatus.COMPLETED)
+        )
+
+
+class AsyncTaskRepository(TaskQueries, AsyncBaseRepository[Task]):
+    """An AsyncSession cannot lazy load, so pick a `load` profile covering every relationship the
+    caller will touch."""
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(Task, db)
+        self.dialect_name = db.bind.dialect.name
+
+    async def get(self, id: int, load: tuple = TaskLoad.DETAIL) -> Optional[Task]:
+        # Reload collections that may already sit stale in the identity map after a write
+        stmt = self._get_statement(id, load).execution_options(populate_existing=True)
+        return (await self.db.execute(stmt)).unique().scalars().first()
+
+    async def get_many(self, ids: List[int], load: tuple = TaskLoad.LIST) -> List[Task]:
+        """Tasks for the given ids, in the order of `ids`"""
+        result = await self.db.execute(self._get_many_statement(ids, load))
+        return self._in_order(result.unique().scalars().all(), ids)
+
+    async def search_tasks(self, owner_id: int, search: Optional[str] = None, status: Optional[TaskStatus] = None,
+                           priority: Optional[TaskPriority] = None, label_ids: Optional[List[int]] = None,
+                           overdue_only: bool = False, skip: int = 0, limit: int = 100,
+                           sort_by: str = "created_at", sort_order: str = "desc",
+                           load: tuple = TaskLoad.LIST) -> tuple[List[Task], int]:
+        count_stmt, stmt, ranked = self._listing_statements(
+            owner_id, search, status, priority, label_ids, overdue_only, skip=skip, limit=limit,
+            sort_by=sort_by, sort_order=sort_order, load=load)
+        total = (await self.db.execute(count_stmt)).scalar_one()
+        return self._tasks_from_rows(await self.db.execute(stmt), ranked), total
+
+    async def search_tasks_keyset(self, owner_id: int, values: list, direction: str = "next",
+                                  search: Optional[str] = None, status: Optional[TaskStatus] = None,
+                                  priority: Optional[TaskPriority] = None, label_ids: Optional[List[int]] = None,
+                                  overdue_only: bool = False, limit: int = 100,
+                                  sort_by: str = "created_at", sort_order: str = "desc",
+                                  load: tuple = TaskLoad.LIST) -> tuple[List[Task], int, bool]:
+        count_stmt, stmt, ranked = self._listing_statements(
+            owner_id, search, status, priority, label_ids, overdue_only, limit=limit + 1,
+            sort_by=sort_by, sort_order=sort_order, keyset=values, direction=direction, load=load)
+        total = (await self.db.execute(count_stmt)).scalar_one()
+        rows = self._tasks_from_rows(await self.db.execute(stmt), ranked)
+        tasks, has_more = self._keyset_page(rows, limit, direction)
+        return tasks, total, has_more
+
+    async def soft_delete(self, task_id: int) -> Optional[Task]:
+        task = await self.get(task_id)
         if task:
             task.is_deleted = True
             task.deleted_at = datetime.utcnow()
-            self.db.commit()
-            self.db.refresh(task)
+            await self._commit(task)
         return task
 
-    def restore(self, task_id: int) -> Optional[Task]:
-        task = self.get(task_id)
+    async def restore(self, task_id: int) -> Optional[Task]:
+        task = await self.get(task_id)
         if task and task.is_deleted:
             task.is_deleted = False
             task.deleted_at = None
-            self.db.commit()
-            self.db.refresh(task)
+            await self._commit(task)
         return task
 
-    def get_overdue_tasks(self, owner_id: int) -> List[Task]:
-        return self.db.query(Task).filter(
-            and_(Task.owner_id == owner_id, Task.is_deleted == False,
-                 Task.due_date < datetime.utcnow(), Task.status != TaskStatus.COMPLETED)
-        ).all()
+    async def get_overdue_tasks(self, owner_id: int) -> List[Task]:
+        result = await self.db.execute(self._overdue_statement(owner_id))
+        return list(result.scalars().all())
+
+    async def get_calendar(self, owner_id: int, start: datetime, end: datetime, limit: int = 5000) -> list:
+        result = await self.db.execute(self._calendar_statement(owner_id, start, end, limit))
+        return list(result.all())
+
+    async def get_stats(self, owner_id: int) -> dict:
+        totals, per_label = self._stats_statements(owner_id, datetime.utcnow())
+        return self._stats_from_rows((await self.db.execute(totals)).one(), (await self.db.execute(per_label)).all())
+
+    # Bulk operations. These never commit; run them inside a unit of work.
+
+    async def get_owned(self, ids: List[int], owner_id: int) -> List[Task]:
+        result = await self.db.execute(select(Task).where(Task.id.in_(ids), Task.owner_id == owner_id))
+        return list(result.scalars().all())
+
+    async def bulk_insert(self, rows: List[dict]) -> List[int]:
+        """Multi-row INSERT ... RETURNING id; ids come back in the order of `rows`"""
+        stmt = insert(Task).returning(Task.id, sort_by_parameter_order=True)
+        result = await self.db.execute(stmt, rows)
+        return list(result.scalars().all())
+
+    async def bulk_update(self, rows: List[dict]) -> None:
+        """executemany UPDATE by primary key; each row holds `id` plus the columns to set"""
+        if rows:
+            await self.db.execute(update(Task), rows)
+
+    async def bulk_set_deleted(self, ids: List[int], deleted: bool) -> None:
+        values = {"is_deleted": deleted, "deleted_at": datetime.utcnow() if deleted else None}
+        stmt = update(Task).where(Task.id.in_(ids))
+        if not deleted:
+            stmt = stmt.where(Task.is_deleted == True)
+        await self.db.execute(stmt.values(**values).execution_options(synchronize_session=False))
+
+    async def bulk_replace_labels(self, labels_by_task: dict[int, List[int]]) -> None:
+        """Replace the label sets of the given tasks with one DELETE and one multi-row INSERT"""
+        if not labels_by_task:
+            return
+        await self.db.execute(delete(task_labels).where(task_labels.c.task_id.in_(list(labels_by_task))))
+        rows = [{"task_id": task_id, "label_id": label_id}
+                for task_id, label_ids in labels_by_task.items() for label_id in dict.fromkeys(label_ids)]
+        if rows:
+            await self.db.execute(insert(task_labels), rows)
@@ -1,9 +1,10 @@
 
 
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict
+from datetime import datetime, date
 from app.models.task import TaskStatus, TaskPriority
+from app.core.config import settings
 
 
 class LabelBase(BaseModel):
@@ -85,3 +86,71 @@ class TaskListResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class TaskSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    title: str
+    status: TaskStatus
+    priority: TaskPriority
+    due_date: datetime
+
+
+class CalendarDay(BaseModel):
+    date: date
+    tasks: List[TaskSummary]
+
+
+class TaskCalendarResponse(BaseModel):
+    start: date
+    end: date
+    days: List[CalendarDay]
+    truncated: bool = False
+
+
+class LabelCount(BaseModel):
+    label_id: int
+    name: str
+    color: Optional[str] = None
+    count: int
+
+
+class TaskStatsResponse(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+    overdue: int
+    due_this_week: int
+    by_label: List[LabelCount]
+
+
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: int
+
+
+class TaskBulkUpdate(BaseModel):
+    tasks: List[TaskBulkUpdateItem] = Field(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+
+
+class TaskBulkIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    success: bool
+    detail: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    results: List[BulkItemResult]
+    succeeded: int
+    failed: int
@@ -0,0 +1,183 @@
+"""Write-behind pipeline for activity logs.
+
+With ACTIVITY_WRITE_BEHIND enabled, activity events are handed to an in-process
+bounded queue once the request's transaction commits, and a background worker
+inserts them in multi-row batches of up to ACTIVITY_BATCH_SIZE rows or every
+ACTIVITY_FLUSH_INTERVAL seconds, whichever comes first. A full queue makes
+producers wait (backpressure) instead of dropping events, and stop() drains
+the queue before shutdown. A batch that fails to insert is retried with
+backoff (ACTIVITY_FLUSH_RETRIES, ACTIVITY_RETRY_BACKOFF) and then inserted
+row by row; only rows the database still rejects are dropped, and counted in
+activity_events{outcome="dropped"}.
+
+When the writer is not running (the default, or in scripts) events are inserted
+inline as part of the caller's unit of work.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import activity_events
+from app.db.session import AsyncSessionLocal
+from app.db.unit_of_work import after_commit
+from app.models.label import ActivityLog
+from app.repositories.activity_repo import AsyncActivityRepository
+from app.services.task_snapshots import task_snapshots
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.backpressure_waits = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still queued, then stop the worker"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._worker
+        self._worker = None
+
+    async def enqueue_many(self, rows: List[dict]) -> None:
+        for row in rows:
+            if self._queue.full():
+                self.backpressure_waits += 1
+            await self._queue.put(row)
+            self.enqueued += 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._flush(batch)
+
+    @staticmethod
+    async def _insert(rows: List[dict]) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(ActivityLog), rows)
+            await db.commit()
+
+    async def _flush(self, batch: List[dict]) -> None:
+        started = time.perf_counter()
+        written = await self._insert_with_retries(batch)
+        if written is None:
+            # Still failing: most likely a row the database rejects (its task deleted meanwhile); save the rest
+            written = []
+            for row in batch:
+                try:
+                    await self._insert([row])
+                    written.append(row)
+                except Exception as e:
+                    print(f"Activity log event dropped after {self.retries} retries: {e}")
+            self.failed += len(batch) - len(written)
+            activity_events.inc("dropped", amount=len(batch) - len(written))
+        self.written += len(written)
+        activity_events.inc("written", amount=len(written))
+        if written:
+            # Tasks are rendered with their activity, which lands after their own invalidation
+            await task_snapshots.invalidate(row['task_id'] for row in written)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    async def _insert_with_retries(self, batch: List[dict]) -> Optional[List[dict]]:
+        """The batch once inserted, or None if every attempt failed"""
+        delay = settings.ACTIVITY_RETRY_BACKOFF
+        for attempt in range(settings.ACTIVITY_FLUSH_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(delay)
+                delay *= 2
+                self.retries += 1
+                activity_events.inc("retried", amount=len(batch))
+            try:
+                await self._insert(batch)
+                return batch
+            except Exception as e:
+                print(f"Activity log flush error ({len(batch)} events, attempt {attempt + 1}): {e}")
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+            "backpressure_waits": self.backpressure_waits,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 3) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+activity_writer = ActivityLogWriter(settings.ACTIVITY_QUEUE_SIZE, settings.ACTIVITY_BATCH_SIZE,
+                                    settings.ACTIVITY_FLUSH_INTERVAL)
+
+
+async def record_activity(db: AsyncSession, rows: List[dict]) -> None:
+    """Record activity events as part of the unit of work open on `db`.
+
+    Each row holds task_id, user_id, action and description. With the writer
+    running they are queued after the commit, so a rolled back request logs
+    nothing; otherwise they are inserted in the current transaction.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    # Stamp the event time now rather than when the batch happens to be flushed
+    rows = [{**row, 'created_at': row.get('created_at') or now} for row in rows]
+    if activity_writer.running:
+        after_commit(db, lambda: activity_writer.enqueue_many(rows))
+    else:
+        await AsyncActivityRepository(db).bulk_create(rows)
@@ -0,0 +1,146 @@
+"""Change stream: fan-out of compact task change events to /tasks/stream clients.
+
+Writers publish events for a user once their transaction has committed. Every
+worker runs one broker holding a bounded queue per open connection, keyed by
+user. With Redis fan-out the events go out on a single channel that each
+worker's broker (the publisher's included) subscribes to once, so a client
+sees changes made through any worker while an idle connection costs only its
+queue, with no Redis connection of its own.
+
+A client that falls STREAM_QUEUE_SIZE events behind gets one "resync" event in
+place of the backlog and is expected to refetch; the same happens to every
+client when the Redis subscription had to be re-established.
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from app.core.config import settings
+
+CHANNEL = "tasks:changes"
+RESYNC = {"type": "resync"}
+
+
+def change_event(event_type: str, task_id: int, **extra) -> dict:
+    """e.g. change_event("task.updated", 7, fields=["status"])"""
+    return {"type": event_type, "task_id": task_id, **extra, "at": datetime.utcnow().isoformat()}
+
+
+def encode(user_id: int, events: List[dict]) -> str:
+    return json.dumps({"user_id": user_id, "events": events})
+
+
+class ChangeBroker:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.redis = None
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def start(self, redis_client=None) -> None:
+        """Without a Redis client events only reach connections on this worker"""
+        if self._listener is not None:
+            return
+        self.redis = redis_client
+        if redis_client is not None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self.redis = None
+
+    async def publish(self, user_id: int, events: List[dict]) -> None:
+        if not events:
+            return
+        self.published += len(events)
+        if self.redis is not None:
+            try:
+                await self.redis.publish(CHANNEL, encode(user_id, events))
+                return
+            except Exception as e:
+                print(f"Redis error during change publish: {e}")
+        # No fan-out (or Redis is down): at least this worker's clients hear about it
+        self._deliver(user_id, events)
+
+    async def listen(self, user_id: int, heartbeat: float) -> AsyncIterator[Optional[dict]]:
+        """Yield the user's events as they arrive, and None after `heartbeat` idle seconds"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            queues = self._subscribers.get(user_id)
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def stats(self) -> dict:
+        return {
+            "fanout": "redis" if self.redis is not None else "local",
+            "users": len(self._subscribers),
+            "connections": self.connections,
+            "published": self.published,
+            "delivered": self.delivered,
+            "resyncs": self.resyncs,
+        }
+
+    def _deliver(self, user_id: int, events: List[dict]) -> None:
+        for queue in self._subscribers.get(user_id, ()):
+            for event in events:
+                if queue.full():
+                    self._resync(queue)
+                    break
+                queue.put_nowait(event)
+                self.delivered += 1
+
+    def _resync(self, queue: asyncio.Queue) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+        self.resyncs += 1
+
+    async def _listen(self) -> None:
+        resubscribed = False
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                if resubscribed:
+                    # Whatever was published while we were away is lost
+                    for queues in self._subscribers.values():
+                        for queue in queues:
+                            self._resync(queue)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    self._deliver(payload["user_id"], payload["events"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Redis error in change stream subscription: {e}")
+            finally:
+                await pubsub.aclose()
+            resubscribed = True
+            await asyncio.sleep(settings.STREAM_RETRY_INTERVAL)
+
+
+change_broker = ChangeBroker(settings.STREAM_QUEUE_SIZE)
@@ -0,0 +1,302 @@
+"""In-process due-date scheduler.
+
+The leader worker keeps a min-heap of (due_date, task_id) for open tasks falling
+due within the next SCHEDULER_HORIZON seconds, loaded window by window from the
+due_date index, and sleeps until the earliest one. When a task becomes overdue
+the registered listeners are called with it.
+
+Leadership is a Redis lease (SET NX PX, renewed by its owner), so only one worker
+of a multi-worker deployment fires events. Task writes on any worker go through
+schedule(): the leader applies them to its heap directly, other workers publish
+them on a Redis channel the leader subscribes to. Heap entries are never removed
+in place; an entry whose due date was changed since is skipped when it pops, and
+the remaining ones are re-checked against the database before firing.
+
+Listeners run as their own tasks, so a slow one (the SMTP digest job) never
+holds up lease renewal. A new leader starts its window at the oldest overdue
+task that was never notified, so tasks falling due while no leader was alive
+still fire.
+"""
+import asyncio
+import heapq
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from redis.exceptions import WatchError
+from sqlalchemy import func, or_, select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.task import Task, TaskStatus
+
+LEASE_KEY = "scheduler:due:lease"
+CHANGES_CHANNEL = "scheduler:due:changes"
+
+OverdueListener = Callable[[list], Awaitable[None]]
+
+
+def _open_task(*criteria):
+    return (Task.is_deleted == False, Task.status != TaskStatus.COMPLETED, Task.due_date.isnot(None), *criteria)
+
+
+def _unnotified():
+    # The overdue digest ledger; always true for a task not yet due
+    return or_(Task.overdue_notified_at.is_(None), Task.overdue_notified_at < Task.due_date)
+
+
+class DueDateScheduler:
+    def __init__(self, horizon: int, max_loaded: int, lease_ttl: int):
+        self.horizon = timedelta(seconds=horizon)
+        self.max_loaded = max_loaded
+        self.lease_ttl = lease_ttl
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.redis = None
+        self.is_leader = False
+        self.fired = 0
+        self._heap: List[Tuple[datetime, int]] = []
+        self._latest: Dict[int, Optional[datetime]] = {}
+        self._loaded_until: Optional[datetime] = None
+        self._listeners: List[OverdueListener] = []
+        self._wake = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._subscriber: Optional[asyncio.Task] = None
+        self._notifying: Set[asyncio.Task] = set()
+
+    def add_listener(self, listener: OverdueListener) -> None:
+        """`await listener(tasks)` with the rows (id, title, owner_id, due_date) that just became overdue"""
+        self._listeners.append(listener)
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    async def start(self, redis_client) -> None:
+        if self.running:
+            return
+        self.redis = redis_client
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+        await self._step_down()
+        for job in list(self._notifying):
+            job.cancel()
+        await asyncio.gather(*self._notifying, return_exceptions=True)
+        try:
+            await self._release_lease()
+        except Exception as e:
+            print(f"Redis error during scheduler lease release: {e}")
+
+    async def schedule(self, changes: List[Tuple[int, Optional[datetime]]]) -> None:
+        """Record new due dates (None: no longer schedulable, e.g. deleted or completed)"""
+        if not self.running or not changes:
+            return
+        if self.is_leader:
+            for task_id, due_date in changes:
+                self._apply(task_id, due_date)
+            return
+        try:
+            payload = json.dumps([[task_id, due_date.isoformat() if due_date else None] for task_id, due_date in changes])
+            await self.redis.publish(CHANGES_CHANNEL, payload)
+        except Exception as e:
+            print(f"Redis error during scheduler publish: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "leader": self.is_leader,
+            "worker_id": self.worker_id,
+            "heap_size": len(self._heap),
+            "next_due": self._heap[0][0].isoformat() if self._heap else None,
+            "loaded_until": self._loaded_until.isoformat() if self._loaded_until else None,
+            "fired": self.fired,
+            "notifying": len(self._notifying),
+        }
+
+    # Heap
+
+    def _apply(self, task_id: int, due_date: Optional[datetime]) -> None:
+        # Beyond the loaded window the row is picked up when the window advances.
+        # Either way any older heap entry for the task no longer matches _latest.
+        if due_date is None or self._loaded_until is None or due_date > self._loaded_until:
+            self._latest.pop(task_id, None)
+            return
+        self._latest[task_id] = due_date
+        heapq.heappush(self._heap, (due_date, task_id))
+        if self._heap[0] == (due_date, task_id):
+            self._wake.set()
+
+    async def _load_window(self, start: datetime, end: datetime) -> None:
+        """Load open tasks due in [start, end] from the due_date index, capped at max_loaded rows.
+        Rows on the boundary may be loaded twice; the duplicate entry is skipped when it pops."""
+        limit = max(self.max_loaded - len(self._heap), 1)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Task.id, Task.due_date)
+                .where(*_open_task(Task.due_date >= start, Task.due_date <= end, _unnotified()))
+                .order_by(Task.due_date).limit(limit)
+            )).all()
+        for task_id, due_date in rows:
+            self._latest[task_id] = due_date
+            heapq.heappush(self._heap, (due_date, task_id))
+        # A truncated window only extends as far as what was actually loaded
+        self._loaded_until = rows[-1].due_date if len(rows) == limit else end
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_date, task_id = heapq.heappop(self._heap)
+            if self._latest.get(task_id) == due_date:
+                del self._latest[task_id]
+                due.append(task_id)
+        return due
+
+    async def _fire(self, task_ids: List[int], now: datetime) -> None:
+        async with AsyncSessionLocal() as db:
+            tasks = (await db.execute(
+                select(Task.id, Task.title, Task.owner_id, Task.due_date)
+                .where(*_open_task(Task.id.in_(task_ids), Task.due_date <= now))
+            )).all()
+        if not tasks:
+            return
+        self.fired += len(tasks)
+        for listener in self._listeners:
+            job = asyncio.create_task(self._notify(listener, tasks))
+            self._notifying.add(job)
+            job.add_done_callback(self._notifying.discard)
+
+    @staticmethod
+    async def _notify(listener: OverdueListener, tasks: list) -> None:
+        try:
+            await listener(tasks)
+        except Exception as e:
+            print(f"Due-date listener error: {e}")
+
+    # Leadership
+
+    async def _acquire_lease(self) -> bool:
+        return bool(await self.redis.set(LEASE_KEY, self.worker_id, nx=True, px=self.lease_ttl * 1000))
+
+    async def _renew_lease(self) -> bool:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(LEASE_KEY)
+                if await pipe.get(LEASE_KEY) != self.worker_id:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.pexpire(LEASE_KEY, self.lease_ttl * 1000)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def _release_lease(self) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(LEASE_KEY)
+                if await pipe.get(LEASE_KEY) == self.worker_id:
+                    pipe.multi()
+                    pipe.delete(LEASE_KEY)
+                    await pipe.execute()
+                else:
+                    await pipe.unwatch()
+            except WatchError:
+                pass
+
+    async def _become_leader(self) -> None:
+        self.is_leader = True
+        self._heap, self._latest = [], {}
+        self._subscriber = asyncio.create_task(self._listen_for_changes())
+        # Cover what fell due while no leader was alive (a restart, a Redis outage) and was never notified,
+        # and at least what the previous leader may have missed while its lease ran out
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            oldest_missed = (await db.execute(
+                select(func.min(Task.due_date)).where(*_open_task(Task.due_date < now, _unnotified()))
+            )).scalar()
+        start = now - timedelta(seconds=self.lease_ttl)
+        await self._load_window(min(oldest_missed or start, start), now + self.horizon)
+
+    async def _step_down(self) -> None:
+        self.is_leader = False
+        self._heap, self._latest, self._loaded_until = [], {}, None
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            # Let its finally close the pubsub connection before moving on
+            try:
+                await self._subscriber
+            except asyncio.CancelledError:
+                pass
+            self._subscriber = None
+
+    async def _listen_for_changes(self) -> None:
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(CHANGES_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                for task_id, due_date in json.loads(message["data"]):
+                    self._apply(task_id, datetime.fromisoformat(due_date) if due_date else None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Redis error in scheduler subscription: {e}")
+        finally:
+            await pubsub.aclose()
+
+    async def _run(self) -> None:
+        renew_every = self.lease_ttl / 3
+        while True:
+            try:
+                if not self.is_leader:
+                    if await self._acquire_lease():
+                        await self._become_leader()
+                    else:
+                        await asyncio.sleep(renew_every)
+                        continue
+                elif not await self._renew_lease():
+                    await self._step_down()
+                    continue
+
+                renew_at = asyncio.get_running_loop().time() + renew_every
+                while self.is_leader:
+                    now = datetime.utcnow()
+                    due = self._pop_due(now)
+                    if due:
+                        await self._fire(due, now)
+                    if self._loaded_until - now < self.horizon / 2:
+                        await self._load_window(self._loaded_until, now + self.horizon)
+
+                    remaining = renew_at - asyncio.get_running_loop().time()
+                    if remaining <= 0:
+                        break
+                    timeout = remaining
+                    if self._heap:
+                        timeout = min(timeout, max((self._heap[0][0] - datetime.utcnow()).total_seconds(), 0))
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Due-date scheduler error: {e}")
+                await self._step_down()
+                await asyncio.sleep(renew_every)
+
+
+due_scheduler = DueDateScheduler(settings.SCHEDULER_HORIZON, settings.SCHEDULER_MAX_LOADED, settings.SCHEDULER_LEASE_TTL)
@@ -1,54 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
+from html import escape
+from itertools import groupby
+from typing import List, Optional
+from sqlalchemy import select, update, and_, or_
 from sqlalchemy.orm import Session
-from app.models.task import Task
+from app.models.task import Task, TaskStatus
 from app.models.user import User
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from app.core.config import settings
+from app.core.metrics import smtp_duration
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Tasks listed in one digest; the rest are summarized as "and N more"
+DIGEST_MAX_TASKS = 50
+
+
+class SMTPConnectionPool:
+    """Bounded pool of logged-in SMTP connections shared by the sender threads.
+
+    Connections are opened lazily, reused across sends and runs, and discarded
+    when the server drops them.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str],
+                 use_tls: bool, size: int, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+        self._idle: List[smtplib.SMTP] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        started = time.perf_counter()
+        try:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            smtp_duration.observe(time.perf_counter() - started, "connect", "error")
+            raise
+        smtp_duration.observe(time.perf_counter() - started, "connect", "ok")
+        return server
+
+    @contextmanager
+    def connection(self, fresh: bool = False):
+        """Borrow a connection; `fresh` skips the idle ones, e.g. after one turned out to be stale"""
+        with self._slots:
+            server = None
+            if not fresh:
+                with self._lock:
+                    server = self._idle.pop() if self._idle else None
+            if server is None:
+                server = self._connect()
+            reusable = True
+            try:
+                yield server
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # The server answered, so the session itself is still usable
+                raise
+            except Exception:
+                reusable = False
+                raise
+            finally:
+                if reusable:
+                    with self._lock:
+                        self._idle.append(server)
+                else:
+                    self._discard(server)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server in idle:
+            self._discard(server)
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
 class EmailNotificationService:
     """Service for sending email notifications for overdue tasks"""
-    
+
     def __init__(self):
-        self.smtp_server = getattr(settings, 'SMTP_SERVER', 'smtp.gmail.com')
-        self.smtp_port = getattr(settings, 'SMTP_PORT', 587)
-        self.smtp_username = getattr(settings, 'SMTP_USERNAME', None)
-        self.smtp_password = getattr(settings, 'SMTP_PASSWORD', None)
-        self.from_email = getattr(settings, 'FROM_EMAIL', self.smtp_username)
-    
-    def send_overdue_task_notification(self, user_email: str, task_title: str, due_date: datetime):
-        """Send email notification for an overdue task"""
-        if not self.smtp_username or not self.smtp_password:
-            logger.warning("SMTP credentials not configured. Email notification skipped.")
-            return False
-        
-        try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f'⏰ Task Overdue: {task_title}'
-            msg['From'] = self.from_email
-            msg['To'] = user_email
-            
-            # Create HTML content
-            html = f"""
+        self.smtp_server = settings.SMTP_SERVER
+        self.smtp_port = settings.SMTP_PORT
+        self.smtp_username = settings.SMTP_USERNAME
+        self.smtp_password = settings.SMTP_PASSWORD
+        self.use_tls = settings.SMTP_USE_TLS
+        self.from_email = settings.FROM_EMAIL or self.smtp_username
+        self.pool = SMTPConnectionPool(self.smtp_server, self.smtp_port, self.smtp_username, self.smtp_password,
+                                       self.use_tls, settings.SMTP_POOL_SIZE)
+        self._run_lock = threading.Lock()
+        # Runs requested while one was in progress: the running one repeats for them before it returns
+        self._rerun_lock = threading.Lock()
+        self._rerun_all = False
+        self._rerun_owners: set = set()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.smtp_server) and (bool(self.smtp_username and self.smtp_password) or not self.use_tls)
+
+    @property
+    def running(self) -> bool:
+        return self._run_lock.locked()
+
+    def _send(self, msg: MIMEMultipart) -> bool:
+        # A pooled connection may have timed out server-side; retry once on a fresh one
+        for attempt in range(2):
+            try:
+                with self.pool.connection(fresh=attempt > 0) as server:
+                    started = time.perf_counter()
+                    try:
+                        server.send_message(msg)
+                    except Exception:
+                        smtp_duration.observe(time.perf_counter() - started, "send", "error")
+                        raise
+                    smtp_duration.observe(time.perf_counter() - started, "send", "ok")
+                return True
+            except smtplib.SMTPServerDisconnected as e:
+                if attempt:
+                    logger.error(f"Failed to send email notification: {str(e)}")
+            except Exception as e:
+                logger.error(f"Failed to send email notification: {str(e)}")
+                return False
+        return False
+
+    def _message(self, user_email: str, subject: str, body: str) -> MIMEMultipart:
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = self.from_email or "noreply@localhost"
+        msg['To'] = user_email
+        html = f"""
             <html>
               <body style="font-family: Arial, sans-serif; padding: 20px;">
                 <div style="max-width: 600px; margin: 0 auto; background-color: #f9fafb; padding: 30px; border-radius: 10px;">
-                  <h2 style="color: #ef4444;">⏰ Task Overdue Alert</h2>
-                  <p style="font-size: 16px; color: #374151;">
-                    Your task <strong>"{task_title}"</strong> was due on <strong>{due_date.strftime('%B %d, %Y at %I:%M %p')}</strong> 
-                    and has not been completed yet.
-                  </p>
-                  <div style="margin: 30px 0; padding: 20px; background-color: #fee2e2; border-left: 4px solid #ef4444; border-radius: 5px;">
-                    <p style="margin: 0; color: #991b1b; font-weight: bold;">
-                      Please complete this task as soon as possible!
-                    </p>
-                  </div>
+                  {body}
                   <p style="font-size: 14px; color: #6b7280;">
                     Log in to your Task Management System to update the task status.
                   </p>
@@ -60,49 +165,137 @@ class EmailNotificationService:
               </body>
             </html>
             """
-            
-            # Attach HTML content
-            html_part = MIMEText(html, 'html')
-            msg.attach(html_part)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(msg)
-            
-            logger.info(f"Overdue task notification sent to {user_email} for task: {task_title}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email notification: {str(e)}")
+        msg.attach(MIMEText(html, 'html'))
+        return msg
+
+    def send_overdue_task_notification(self, user_email: str, task_title: str, due_date: datetime):
+        """Send email notification for an overdue task"""
+        if not self.configured:
+            logger.warning("SMTP credentials not configured. Email notification skipped.")
             return False
-    
-    def check_and_notify_overdue_tasks(self, db: Session):
-        """Check for overdue tasks and send notifications"""
+
+        body = f"""
+                  <h2 style="color: #ef4444;">⏰ Task Overdue Alert</h2>
+                  <p style="font-size: 16px; color: #374151;">
+                    Your task <strong>"{escape(task_title)}"</strong> was due on <strong>{due_date.strftime('%B %d, %Y at %I:%M %p')}</strong>
+                    and has not been completed yet.
+                  </p>
+                  <div style="margin: 30px 0; padding: 20px; background-color: #fee2e2; border-left: 4px solid #ef4444; border-radius: 5px;">
+                    <p style="margin: 0; color: #991b1b; font-weight: bold;">
+                      Please complete this task as soon as possible!
+                    </p>
+                  </div>
+        """
+        sent = self._send(self._message(user_email, f'⏰ Task Overdue: {task_title}', body))
+        if sent:
+            logger.info(f"Overdue task notification sent to {user_email} for task: {task_title}")
+        return sent
+
+    def send_overdue_digest(self, user_email: str, tasks: list) -> bool:
+        """One email listing all of a user's newly overdue tasks (rows with title and due_date)"""
+        items = "".join(
+            f'<li style="margin-bottom: 8px;"><strong>{escape(t.title)}</strong> — due {t.due_date.strftime("%B %d, %Y at %I:%M %p")}</li>'
+            for t in tasks[:DIGEST_MAX_TASKS]
+        )
+        if len(tasks) > DIGEST_MAX_TASKS:
+            items += f'<li style="color: #6b7280;">and {len(tasks) - DIGEST_MAX_TASKS} more</li>'
+        body = f"""
+                  <h2 style="color: #ef4444;">⏰ {len(tasks)} overdue task{'s' if len(tasks) != 1 else ''}</h2>
+                  <p style="font-size: 16px; color: #374151;">These tasks are past their due date and have not been completed yet:</p>
+                  <ul style="margin: 20px 0; padding: 20px 20px 20px 40px; background-color: #fee2e2; border-left: 4px solid #ef4444; border-radius: 5px; color: #991b1b;">
+                    {items}
+                  </ul>
+        """
+        subject = f'⏰ Task Overdue: {tasks[0].title}' if len(tasks) == 1 else f'⏰ {len(tasks)} tasks are overdue'
+        return self._send(self._message(user_email, subject, body))
+
+    def check_and_notify_overdue_tasks(self, db: Session, owner_ids: Optional[List[int]] = None) -> dict:
+        """Mail every user (or only `owner_ids`) one digest of their overdue tasks that have not been notified yet.
+
+        Owners are processed in batches of NOTIFY_USERS_PER_BATCH: their tasks are
+        streamed (yield_per) joined to users, digests are sent concurrently over the
+        SMTP pool, and the notified tasks are stamped and committed before the next
+        batch, so an interrupted run resumes without re-sending.
+
+        A call made while a run is in progress is not dropped: the running call
+        repeats for the requested owners before it returns, and this one returns
+        {"queued": True} at once.
+        """
+        result = {"users_notified": 0, "tasks_notified": 0, "failed": 0}
+        if not self.configured:
+            logger.warning("SMTP credentials not configured. Email notification skipped.")
+            return result
+        with self._rerun_lock:
+            if not self._run_lock.acquire(blocking=False):
+                self._rerun_all = self._rerun_all or owner_ids is None
+                self._rerun_owners.update(owner_ids or ())
+                logger.info("Overdue notification run already in progress; queued a rerun")
+                return {**result, "queued": True}
+
+        try:
+            while True:
+                self._notify(db, owner_ids, result)
+                with self._rerun_lock:
+                    if not self._rerun_all and not self._rerun_owners:
+                        # Released under the rerun lock, so no request slips in between check and release
+                        self._run_lock.release()
+                        break
+                    owner_ids = None if self._rerun_all else sorted(self._rerun_owners)
+                    self._rerun_all = False
+                    self._rerun_owners = set()
+        except BaseException:
+            self._run_lock.release()
+            raise
+
+        logger.info(f"Sent {result['users_notified']} overdue task digests covering {result['tasks_notified']} tasks")
+        return result
+
+    def _notify(self, db: Session, owner_ids: Optional[List[int]], result: dict) -> None:
         now = datetime.utcnow()
-        
-        # Find all overdue tasks that are not completed
-        overdue_tasks = db.query(Task).filter(
+        pending = and_(
             Task.due_date <= now,
-            Task.status != 'completed',
-            Task.is_deleted == False
-        ).all()
-        
-        notifications_sent = 0
-        for task in overdue_tasks:
-            # Get task owner
-            user = db.query(User).filter(User.id == task.user_id).first()
-            if user and user.email:
-                success = self.send_overdue_task_notification(
-                    user_email=user.email,
-                    task_title=task.title,
-                    due_date=task.due_date
+            Task.status != TaskStatus.COMPLETED,
+            Task.is_deleted == False,
+            or_(Task.overdue_notified_at.is_(None), Task.overdue_notified_at < Task.due_date),
+        )
+        if owner_ids is not None:
+            pending = and_(pending, Task.owner_id.in_(owner_ids))
+        last_owner_id = 0
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            while True:
+                batch_owner_ids = list(db.execute(
+                    select(Task.owner_id).where(pending, Task.owner_id > last_owner_id)
+                    .distinct().order_by(Task.owner_id).limit(settings.NOTIFY_USERS_PER_BATCH)
+                ).scalars())
+                if not batch_owner_ids:
+                    break
+                last_owner_id = batch_owner_ids[-1]
+
+                rows = db.execute(
+                    select(Task.id, Task.title, Task.due_date, Task.owner_id, User.email)
+                    .join(User, User.id == Task.owner_id)
+                    .where(pending, Task.owner_id.in_(batch_owner_ids), User.is_active == True)
+                    .order_by(Task.owner_id, Task.due_date, Task.id)
+                    .execution_options(yield_per=settings.NOTIFY_YIELD_PER)
                 )
-                if success:
-                    notifications_sent += 1
-        
-        logger.info(f"Sent {notifications_sent} overdue task notifications")
-        return notifications_sent
+                digests = []
+                for _, group in groupby(rows, key=lambda row: row.owner_id):
+                    tasks = list(group)
+                    if tasks[0].email:
+                        digests.append((executor.submit(self.send_overdue_digest, tasks[0].email, tasks),
+                                        [t.id for t in tasks]))
+
+                sent_ids = []
+                for future, task_ids in digests:
+                    if future.result():
+                        result["users_notified"] += 1
+                        sent_ids.extend(task_ids)
+                    else:
+                        result["failed"] += 1
+                if sent_ids:
+                    db.execute(update(Task).where(Task.id.in_(sent_ids)).values(overdue_notified_at=now)
+                               .execution_options(synchronize_session=False))
+                db.commit()
+                result["tasks_notified"] += len(sent_ids)
 
 email_service = EmailNotificationService()
@@ -0,0 +1,235 @@
+"""Stampede-safe read-through cache over Redis.
+
+A popular key that disappears (invalidated by a generation bump, or expired)
+would otherwise send every concurrent request to the database with the same
+query. get_or_load() prevents that in three ways:
+
+* Single flight: within a worker, concurrent misses of one key share a single
+  load; across workers, the loader holds a short Redis lock (SET NX PX,
+  CACHE_LOCK_TTL) and the others poll the key until it is filled, falling back
+  to their own load if the lock expires first.
+* Probabilistic early refresh (XFetch): each entry records how long its load
+  took, and a read shortly before expiry refreshes it in the background with a
+  probability that grows as expiry nears and with the cost of the load
+  (CACHE_XFETCH_BETA; 0 disables).
+* Stale-while-revalidate: entries stay in Redis CACHE_STALE_TTL seconds past
+  their freshness; a read in that window returns the stale value at once and
+  refreshes it in the background.
+
+An optional LocalCache in front keeps fresh entries in process for up to
+LOCAL_CACHE_TTL (never past their freshness), so a hot key costs no Redis round
+trip at all. It suits keys that change when their content does, since a
+background refresh on one worker does not reach the others' local copies.
+
+Background refreshes run on their own session, as the request's is closed by
+the time they finish. Invalidation by changing the key (the task caches bake a
+per-user generation into theirs) is never served stale: the new key is a plain
+miss, coalesced as above.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import cache_requests, redis_duration, timed
+from app.core.tiered_cache import MISSING, LocalCache
+from app.db.session import AsyncSessionLocal
+
+Fetch = Callable[[AsyncSession], Awaitable[Any]]
+
+LOCK_POLL_INTERVAL = 0.025
+
+
+class SingleFlightCache:
+    def __init__(self, name: str, redis: Callable[[], Any], local: Optional[LocalCache] = None):
+        self.name = name
+        # Resolved on every call, so a client swapped in after import (tests, benchmarks) is used
+        self._redis = redis
+        self.local = local
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.early_refreshes = 0
+        self.coalesced = 0
+        self.lock_waits = 0
+        self.lock_timeouts = 0
+        self.refresh_errors = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
+
+    async def get_or_load(self, key: str, fetch: Fetch, db: AsyncSession) -> Any:
+        """The cached value of `key`, or `await fetch(db)` stored under it; fetch must return JSON-serializable data"""
+        if self.local is not None:
+            entry = self.local.get(key)
+            if entry is not MISSING:
+                cache_requests.inc(self.name, "hit")
+                return entry["value"]
+
+        redis = self._redis()
+        try:
+            with timed(redis_duration, self.name):
+                raw = await redis.get(key)
+        except Exception as e:
+            cache_requests.inc(self.name, "error")
+            print(f"Redis error during cache retrieval: {e}")
+            return await fetch(db)
+
+        if raw is not None:
+            entry = json.loads(raw)
+            now = time.time()
+            if now >= entry["fresh_until"]:
+                self.stale_served += 1
+                cache_requests.inc(self.name, "stale")
+                self._refresh_in_background(key, fetch)
+            else:
+                self.hits += 1
+                cache_requests.inc(self.name, "hit")
+                if self._refresh_early(entry, now):
+                    self.early_refreshes += 1
+                    self._refresh_in_background(key, fetch)
+                else:
+                    self._keep_local(key, entry, now)
+            return entry["value"]
+
+        self.misses += 1
+        cache_requests.inc(self.name, "miss")
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The loading request was cancelled (client went away), this one was not
+                return await fetch(db)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load_once(key, fetch, db)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Marked retrieved: waiters, if any, raise it themselves
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    @staticmethod
+    def _refresh_early(entry: dict, now: float) -> bool:
+        # XFetch: -log(U) is exponentially distributed, so expensive loads start refreshing earlier
+        beta = settings.CACHE_XFETCH_BETA
+        return beta > 0 and now - entry["delta"] * beta * math.log(1.0 - random.random()) >= entry["fresh_until"]
+
+    async def _load_once(self, key: str, fetch: Fetch, db: AsyncSession) -> Any:
+        """Load under the cross-worker lock; without it, wait for the holder to fill the key"""
+        redis = self._redis()
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        try:
+            locked = await redis.set(lock_key, token, nx=True, px=int(settings.CACHE_LOCK_TTL * 1000))
+        except Exception as e:
+            print(f"Redis error during cache lock: {e}")
+            return await fetch(db)
+
+        if not locked:
+            self.lock_waits += 1
+            deadline = time.monotonic() + settings.CACHE_LOCK_TTL
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                try:
+                    raw = await redis.get(key)
+                except Exception:
+                    break
+                if raw is not None:
+                    return json.loads(raw)["value"]
+            # The holder failed or is too slow; load without storing over its result
+            self.lock_timeouts += 1
+            return await fetch(db)
+
+        try:
+            return await self._fill(key, fetch, db)
+        finally:
+            await self._unlock(lock_key, token)
+
+    async def _unlock(self, lock_key: str, token: str) -> None:
+        try:
+            # Not atomic, but a lock that expired mid-load only costs another worker one extra load
+            redis = self._redis()
+            if await redis.get(lock_key) == token:
+                await redis.delete(lock_key)
+        except Exception as e:
+            print(f"Redis error during cache unlock: {e}")
+
+    async def _fill(self, key: str, fetch: Fetch, db: AsyncSession) -> Any:
+        started = time.perf_counter()
+        value = await fetch(db)
+        delta = time.perf_counter() - started
+        now = time.time()
+        entry = {"value": value, "delta": round(delta, 6), "fresh_until": now + settings.CACHE_TTL}
+        try:
+            await self._redis().setex(key, settings.CACHE_TTL + settings.CACHE_STALE_TTL, json.dumps(entry))
+        except Exception as e:
+            print(f"Redis error during cache set: {e}")
+        self._keep_local(key, entry, now)
+        return value
+
+    def _keep_local(self, key: str, entry: dict, now: float) -> None:
+        if self.local is not None:
+            self.local.set(key, entry, ttl=entry["fresh_until"] - now)
+
+    def _refresh_in_background(self, key: str, fetch: Fetch) -> None:
+        if key in self._refreshing or key in self._inflight:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, fetch))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh(self, key: str, fetch: Fetch) -> None:
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        try:
+            # Another worker already refreshing or loading this key is enough
+            if not await self._redis().set(lock_key, token, nx=True, px=int(settings.CACHE_LOCK_TTL * 1000)):
+                return
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self._fill(key, fetch, db)
+            finally:
+                await self._unlock(lock_key, token)
+        except Exception as e:
+            self.refresh_errors += 1
+            print(f"Cache refresh of {key} failed: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_served + self.misses
+        return {
+            "local": self.local.stats() if self.local is not None else None,
+            "hits": self.hits,
+            "stale_served": self.stale_served,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_served) / lookups, 4) if lookups else None,
+            "early_refreshes": self.early_refreshes,
+            "coalesced": self.coalesced,
+            "lock_waits": self.lock_waits,
+            "lock_timeouts": self.lock_timeouts,
+            "refresh_errors": self.refresh_errors,
+            "inflight": len(self._inflight),
+            "refreshing": len(self._refreshing),
+        }
@@ -1,136 +1,412 @@
-
 from typing import Optional, List
-from sqlalchemy.orm import Session
+from datetime import datetime, date, time, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
-from app.repositories.task_repo import TaskRepository
+from app.repositories.task_repo import AsyncTaskRepository, TaskQueries, TaskLoad
+from app.repositories.label_repo import AsyncLabelRepository
+from app.services.activity_writer import record_activity
 from app.models.task import Task, TaskStatus, TaskPriority
-from app.models.label import Label, ActivityLog
-from app.schemas.task import TaskCreate, TaskUpdate
-import json
+from app.schemas.task import TaskCreate, TaskUpdate, TaskBulkUpdateItem, BulkItemResult
 import redis
+import redis.asyncio
 from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.db import fulltext
+from app.db.unit_of_work import AsyncUnitOfWork, after_commit
+from app.services.due_scheduler import due_scheduler
+from app.core.metrics import cache_requests, redis_duration, timed
+from app.services.single_flight import SingleFlightCache
+from app.services.task_snapshots import task_snapshots
+from app.core.tiered_cache import LocalCache
+from app.services.change_stream import change_broker, change_event
 
 if settings.REDIS_URL:
     redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    async_redis_client = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
 else:
     redis_client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB, decode_responses=True)
+    async_redis_client = redis.asyncio.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB, decode_responses=True)
 
+# Stampede-protected read-through caches of AsyncTaskService (list pages as IDs, dashboard stats).
+# Their keys include the generation, which is always read from Redis (a worker-local copy could miss
+# the user's own last write), so their local tiers never need invalidating.
+task_list_cache = SingleFlightCache("task_list", lambda: async_redis_client, local=LocalCache("task_list"))
+task_stats_cache = SingleFlightCache("task_stats", lambda: async_redis_client, local=LocalCache("task_stats"))
 
-class TaskService:
-    def __init__(self, db: Session):
-        self.db = db
-        self.repo = TaskRepository(db)
 
-    def _create_activity_log(self, task_id: int, user_id: int, action: str, description: str):
-        log = ActivityLog(task_id=task_id, user_id=user_id, action=action, description=description)
-        self.db.add(log)
-        self.db.commit()
+def _resolve_listing(search: Optional[str], sort_by: str, sort_order: str, cursor: Optional[str]) -> tuple[str, Optional[dict]]:
+    """Normalize sort_by and decode the cursor, if any, into a keyset position"""
+    if sort_by == "relevance" and not fulltext.search_terms(search):
+        # Nothing to rank without search terms
+        sort_by = "created_at"
 
-    def _invalidate_cache(self, owner_id: int):
+    keyset = None
+    if cursor:
         try:
-            pattern = f"tasks:user:{owner_id}:*"
-            for key in redis_client.scan_iter(match=pattern):
-                redis_client.delete(key)
-        except Exception as e:
-            print(f"Redis error during cache invalidation: {e}")
+            keyset = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if keyset['sort_by'] != sort_by or keyset['sort_order'] != sort_order:
+            raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    return sort_by, keyset
+
+
+def _generation_key(owner_id: int) -> str:
+    """Per-user counter baked into every list cache key; bumping it orphans all of the user's cached pages"""
+    return f"tasks:user:{owner_id}:gen"
+
+
+async def _current_generation(owner_id: int, cache: str) -> Optional[str]:
+    """The owner's list generation; raises on Redis errors"""
+    with timed(redis_duration, cache):
+        return await async_redis_client.get(_generation_key(owner_id))
+
+
+def _list_cache_key(owner_id: int, generation: Optional[str], page: int, page_size: int, sort_by: str, sort_order: str,
+                    cursor: Optional[str]) -> str:
+    position = f"cursor:{cursor}" if cursor else f"page:{page}"
+    return f"tasks:user:{owner_id}:v{generation or 0}:{position}:size:{page_size}:sort:{sort_by}:{sort_order}"
+
+
+def _stats_cache_key(owner_id: int, generation: Optional[str]) -> str:
+    # Shares the list generation, so any task write also invalidates the stats
+    return f"tasks:user:{owner_id}:v{generation or 0}:stats"
+
+
+async def invalidate_task_lists(owner_id: int) -> None:
+    """Orphan the owner's cached list pages and stats, e.g. after a change to labels their tasks carry"""
+    # One INCR; entries of older generations are never read again and expire through CACHE_TTL
+    try:
+        await async_redis_client.incr(_generation_key(owner_id))
+    except Exception as e:
+        print(f"Redis error during cache invalidation: {e}")
+
+
+def _page_cursors(tasks: List[Task], sort_by: str, sort_order: str, has_next: bool, has_prev: bool) -> tuple[Optional[str], Optional[str]]:
+    next_cursor = prev_cursor = None
+    if tasks and has_next:
+        next_cursor = encode_cursor(sort_by, sort_order, TaskQueries.sort_values(tasks[-1], sort_by), "next")
+    if tasks and has_prev:
+        prev_cursor = encode_cursor(sort_by, sort_order, TaskQueries.sort_values(tasks[0], sort_by), "prev")
+    return next_cursor, prev_cursor
+
+
+def _schedulable_due(status: TaskStatus, due_date: Optional[datetime], is_deleted: bool = False) -> Optional[datetime]:
+    """The due date the scheduler should fire for, or None once the task can no longer become overdue"""
+    return None if is_deleted or status == TaskStatus.COMPLETED else due_date
 
-    def create_task(self, task_in: TaskCreate, owner_id: int) -> Task:
+
+def _changed_fields(update_data: dict, label_ids) -> List[str]:
+    return sorted(update_data) + (['label_ids'] if label_ids is not None else [])
+
+
+def _describe_changes(task: Task, update_data: dict) -> List[str]:
+    changes = []
+    for field, new_value in update_data.items():
+        old_value = getattr(task, field)
+        if old_value != new_value:
+            changes.append(f"{field}: {old_value} → {new_value}")
+    return changes
+
+
+class AsyncTaskService:
+    """Task use cases behind the API routes.
+
+    Returned tasks always have labels, comments and activity_logs loaded, since
+    an AsyncSession cannot lazy load them during response serialization.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.repo = AsyncTaskRepository(db)
+
+    async def _create_activity_log(self, task_id: int, user_id: int, action: str, description: str):
+        await record_activity(self.db, [
+            {'task_id': task_id, 'user_id': user_id, 'action': action, 'description': description}
+        ])
+
+    async def _invalidate_cache(self, owner_id: int):
+        await invalidate_task_lists(owner_id)
+
+    async def _changed(self, owner_id: int, events: List[dict]):
+        """Invalidate the owner's cached lists and the changed tasks' snapshots, then push the events
+        to /tasks/stream clients. In this order, a client refetching on an event never reads the stale cache."""
+        await self._invalidate_cache(owner_id)
+        await task_snapshots.invalidate(event['task_id'] for event in events)
+        await change_broker.publish(owner_id, events)
+
+    def _reschedule(self, changes: List[tuple]):
+        """Hand (task_id, due_date) changes to the due-date scheduler once the open unit of work commits"""
+        if due_scheduler.running and changes:
+            after_commit(self.db, lambda: due_scheduler.schedule(changes))
+
+    async def create_task(self, task_in: TaskCreate, owner_id: int) -> Task:
         task_data = task_in.model_dump(exclude={'label_ids'})
         task_data['owner_id'] = owner_id
-        task = self.repo.create(task_data)
-
         if task_in.label_ids:
-            labels = self.db.query(Label).filter(Label.id.in_(task_in.label_ids)).all()
-            task.labels = labels
-            self.db.commit()
-            self.db.refresh(task)
-
-        self._create_activity_log(task.id, owner_id, "created", f"Task '{task.title}' created")
-        self._invalidate_cache(owner_id)
-        return task
+            # Attach labels before the INSERT; assigning to a persisted task would need a lazy load
+            task_data['labels'] = await AsyncLabelRepository(self.db).get_many(task_in.label_ids)
+        async with AsyncUnitOfWork(self.db):
+            task = await self.repo.create(task_data)
+            await self._create_activity_log(task.id, owner_id, "created", f"Task '{task.title}' created")
+            if task.due_date:
+                self._reschedule([(task.id, _schedulable_due(task.status, task.due_date))])
+        await self._changed(owner_id, [change_event("task.created", task.id)])
+        return await self.repo.get(task.id)
 
-    def get_task(self, task_id: int, owner_id: int) -> Optional[Task]:
-        task = self.repo.get(task_id)
+    async def get_task(self, task_id: int, owner_id: int) -> Optional[Task]:
+        task = await self.repo.get(task_id)
         if not task or task.owner_id != owner_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
         return task
 
-    def get_tasks(self, owner_id: int, search: Optional[str] = None, status: Optional[TaskStatus] = None,
-                  priority: Optional[TaskPriority] = None, label_ids: Optional[List[int]] = None,
-                  overdue_only: bool = False, page: int = 1, page_size: int = 20,
-                  sort_by: str = "created_at", sort_order: str = "desc") -> tuple[List[Task], int]:
-        cache_key = f"tasks:user:{owner_id}:page:{page}:size:{page_size}:sort:{sort_by}:{sort_order}"
-        if not any([search, status, priority, label_ids, overdue_only]):
-            try:
-                cached = redis_client.get(cache_key)
-                if cached:
-                    data = json.loads(cached)
-                    # Fetch full task objects from IDs
-                    task_ids = data['tasks']
-                    # Maintain sort order from cache
-                    if not task_ids:
-                        return [], data['total']
-                    
-                    tasks = self.db.query(Task).filter(Task.id.in_(task_ids)).all()
-                    # Re-sort in memory because SQL IN clause doesn't guarantee order
-                    task_map = {t.id: t for t in tasks}
-                    sorted_tasks = [task_map[tid] for tid in task_ids if tid in task_map]
-                    return sorted_tasks, data['total']
-            except Exception as e:
-                print(f"Redis error during cache retrieval: {e}")
-
-        skip = (page - 1) * page_size
-        tasks, total = self.repo.search_tasks(owner_id=owner_id, search=search, status=status, priority=priority,
-                                              label_ids=label_ids, overdue_only=overdue_only, skip=skip, limit=page_size,
-                                              sort_by=sort_by, sort_order=sort_order)
-
-        if not any([search, status, priority, label_ids, overdue_only]):
+    async def get_tasks(self, owner_id: int, search: Optional[str] = None, status: Optional[TaskStatus] = None,
+                        priority: Optional[TaskPriority] = None, label_ids: Optional[List[int]] = None,
+                        overdue_only: bool = False, page: int = 1, page_size: int = 20,
+                        sort_by: str = "created_at", sort_order: str = "desc",
+                        cursor: Optional[str] = None) -> tuple[List[str], int, Optional[str], Optional[str]]:
+        """Return (tasks, total, next_cursor, prev_cursor), each task rendered as TaskResponse JSON.
+
+        When `cursor` is given the page is located by keyset instead of `page`,
+        so deep pages cost the same as the first one.
+        """
+        sort_by, keyset = _resolve_listing(search, sort_by, sort_order, cursor)
+        filters = dict(search=search, status=status, priority=priority, label_ids=label_ids,
+                       overdue_only=overdue_only, limit=page_size, sort_by=sort_by, sort_order=sort_order)
+
+        if any([search, status, priority, label_ids, overdue_only]):
+            return await self._rendered_page(owner_id, keyset, page, filters)
+        try:
+            generation = await _current_generation(owner_id, "task_list")
+        except Exception as e:
+            cache_requests.inc("task_list", "error")
+            print(f"Redis error during cache retrieval: {e}")
+            return await self._rendered_page(owner_id, keyset, page, filters)
+
+        loaded = {}
+
+        async def fetch(db: AsyncSession) -> dict:
+            repo = self.repo if db is self.db else AsyncTaskRepository(db)
+            if db is self.db:
+                loaded['since'] = await task_snapshots.sequence()
+            tasks, total, next_cursor, prev_cursor = await self._list_page(repo, owner_id, keyset, page, filters)
+            if db is self.db:
+                loaded['tasks'] = tasks
             # Store only IDs in cache to avoid serialization issues
-            try:
-                cache_data = {'tasks': [t.id for t in tasks], 'total': total}
-                redis_client.setex(cache_key, settings.CACHE_TTL, json.dumps(cache_data))
-            except Exception as e:
-                print(f"Redis error during cache set: {e}")
+            return {'tasks': [t.id for t in tasks], 'total': total,
+                    'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+
+        cache_key = _list_cache_key(owner_id, generation, page, page_size, sort_by, sort_order, cursor)
+        data = await task_list_cache.get_or_load(cache_key, fetch, self.db)
+        tasks = loaded.get('tasks')
+        if tasks is not None:
+            # Loaded by this request: the rows just read also refresh the page's snapshots
+            rendered = await task_snapshots.put(tasks, loaded['since'])
+        else:
+            # Served from the cache, or by a load another request ran
+            rendered = await self._snapshots(data['tasks'])
+        return rendered, data['total'], data['next_cursor'], data['prev_cursor']
+
+    async def _rendered_page(self, owner_id: int, keyset: Optional[dict], page: int,
+                             filters: dict) -> tuple[List[str], int, Optional[str], Optional[str]]:
+        tasks, total, next_cursor, prev_cursor = await self._list_page(self.repo, owner_id, keyset, page, filters)
+        return [task_snapshots.render(task) for task in tasks], total, next_cursor, prev_cursor
+
+    async def _snapshots(self, task_ids: List[int]) -> List[str]:
+        """Rendered tasks in the order of `task_ids`: one MGET, plus one load for those without a snapshot"""
+        snapshots = await task_snapshots.get_many(task_ids)
+        missing = [task_id for task_id, snapshot in zip(task_ids, snapshots) if snapshot is None]
+        if missing:
+            since = await task_snapshots.sequence()
+            tasks = await self.repo.get_many(missing, load=TaskLoad.LIST)
+            rendered = dict(zip((task.id for task in tasks), await task_snapshots.put(tasks, since)))
+            # A task deleted for good since the page was cached is left out, as get_many would
+            snapshots = [snapshot if snapshot is not None else rendered.get(task_id)
+                         for task_id, snapshot in zip(task_ids, snapshots)]
+        return [snapshot for snapshot in snapshots if snapshot is not None]
+
+    @staticmethod
+    async def _list_page(repo: AsyncTaskRepository, owner_id: int, keyset: Optional[dict], page: int,
+                         filters: dict) -> tuple[List[Task], int, Optional[str], Optional[str]]:
+        if keyset:
+            tasks, total, has_more = await repo.search_tasks_keyset(owner_id=owner_id, values=keyset['values'],
+                                                                    direction=keyset['direction'], **filters)
+            has_next = has_more if keyset['direction'] == "next" else True
+            has_prev = has_more if keyset['direction'] == "prev" else True
+        else:
+            skip = (page - 1) * filters['limit']
+            tasks, total = await repo.search_tasks(owner_id=owner_id, skip=skip, **filters)
+            has_next = skip + len(tasks) < total
+            has_prev = skip > 0
+
+        next_cursor, prev_cursor = _page_cursors(tasks, filters['sort_by'], filters['sort_order'], has_next, has_prev)
+        return tasks, total, next_cursor, prev_cursor
+
+    async def get_calendar(self, owner_id: int, start: date, end: date) -> dict:
+        """Task summaries due between `start` and `end` (inclusive, UTC days), grouped by day"""
+        if end < start:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must not be before start")
+        if (end - start).days + 1 > settings.CALENDAR_MAX_DAYS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Calendar window is limited to {settings.CALENDAR_MAX_DAYS} days")
+
+        window_start = datetime.combine(start, time.min)
+        window_end = datetime.combine(end + timedelta(days=1), time.min)
+        rows = await self.repo.get_calendar(owner_id, window_start, window_end, limit=settings.CALENDAR_MAX_TASKS + 1)
+        truncated = len(rows) > settings.CALENDAR_MAX_TASKS
+        days = {}
+        for row in rows[:settings.CALENDAR_MAX_TASKS]:
+            days.setdefault(row.due_date.date(), []).append(row)
+        return {
+            'start': start,
+            'end': end,
+            'days': [{'date': day, 'tasks': tasks} for day, tasks in days.items()],
+            'truncated': truncated,
+        }
+
+    async def get_stats(self, owner_id: int) -> dict:
+        """Dashboard counts from the aggregate queries, cached per user until their next task write"""
+        try:
+            generation = await _current_generation(owner_id, "task_stats")
+        except Exception as e:
+            cache_requests.inc("task_stats", "error")
+            print(f"Redis error during cache retrieval: {e}")
+            return await self.repo.get_stats(owner_id)
+
+        async def fetch(db: AsyncSession) -> dict:
+            return await AsyncTaskRepository(db).get_stats(owner_id)
 
-        return tasks, total
+        # Overdue and due-this-week drift with the clock, so CACHE_TTL still bounds staleness
+        return await task_stats_cache.get_or_load(_stats_cache_key(owner_id, generation), fetch, self.db)
 
-    def update_task(self, task_id: int, task_in: TaskUpdate, owner_id: int) -> Task:
-        task = self.get_task(task_id, owner_id)
-        changes = []
+    async def update_task(self, task_id: int, task_in: TaskUpdate, owner_id: int) -> Task:
+        task = await self.get_task(task_id, owner_id)
         update_data = task_in.model_dump(exclude_unset=True, exclude={'label_ids'})
-        
-        for field, new_value in update_data.items():
-            old_value = getattr(task, field)
-            if old_value != new_value:
-                changes.append(f"{field}: {old_value} → {new_value}")
-        
-        self.repo.update(task, update_data)
-
-        if task_in.label_ids is not None:
-            labels = self.db.query(Label).filter(Label.id.in_(task_in.label_ids)).all()
-            task.labels = labels
-            self.db.commit()
-
-        # Always log updates, even if no changes detected
-        log_message = ", ".join(changes) if changes else f"Task '{task.title}' updated"
-        self._create_activity_log(task.id, owner_id, "updated", log_message)
-
-        self._invalidate_cache(owner_id)
-        self.db.refresh(task)
-        return task
+        changes = _describe_changes(task, update_data)
 
-    def delete_task(self, task_id: int, owner_id: int) -> Task:
-        task = self.get_task(task_id, owner_id)
-        self.repo.soft_delete(task_id)
-        self._create_activity_log(task.id, owner_id, "deleted", f"Task '{task.title}' deleted")
-        self._invalidate_cache(owner_id)
-        return task
+        async with AsyncUnitOfWork(self.db):
+            if task_in.label_ids is not None:
+                task.labels = await AsyncLabelRepository(self.db).get_many(task_in.label_ids)
+            await self.repo.update(task, update_data)
+
+            # Always log updates, even if no changes detected
+            log_message = ", ".join(changes) if changes else f"Task '{task.title}' updated"
+            await self._create_activity_log(task.id, owner_id, "updated", log_message)
+            if 'due_date' in update_data or 'status' in update_data:
+                self._reschedule([(task.id, _schedulable_due(task.status, task.due_date, task.is_deleted))])
+
+        await self._changed(owner_id, [change_event("task.updated", task.id, fields=_changed_fields(update_data, task_in.label_ids))])
+        return await self.repo.get(task.id)
 
-    def restore_task(self, task_id: int, owner_id: int) -> Task:
-        task = self.repo.get(task_id)
+    async def delete_task(self, task_id: int, owner_id: int) -> Task:
+        task = await self.get_task(task_id, owner_id)
+        async with AsyncUnitOfWork(self.db):
+            await self.repo.soft_delete(task_id)
+            await self._create_activity_log(task.id, owner_id, "deleted", f"Task '{task.title}' deleted")
+            self._reschedule([(task.id, None)])
+        await self._changed(owner_id, [change_event("task.deleted", task.id)])
+        return await self.repo.get(task.id)
+
+    async def restore_task(self, task_id: int, owner_id: int) -> Task:
+        task = await self.repo.get(task_id)
         if not task or task.owner_id != owner_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
-        self.repo.restore(task_id)
-        self._create_activity_log(task.id, owner_id, "restored", f"Task '{task.title}' restored")
-        self._invalidate_cache(owner_id)
-        return task
+        async with AsyncUnitOfWork(self.db):
+            await self.repo.restore(task_id)
+            await self._create_activity_log(task.id, owner_id, "restored", f"Task '{task.title}' restored")
+            self._reschedule([(task.id, _schedulable_due(task.status, task.due_date))])
+        await self._changed(owner_id, [change_event("task.restored", task.id)])
+        return await self.repo.get(task.id)
+
+    # Bulk mutations: each call is one transaction, one round of multi-row statements and one cache bump
+
+    async def _bulk_activity_logs(self, user_id: int, entries: List[tuple]):
+        await record_activity(self.db, [
+            {'task_id': task_id, 'user_id': user_id, 'action': action, 'description': description}
+            for task_id, action, description in entries
+        ])
+
+    async def _valid_label_ids(self, label_id_lists) -> set:
+        return await AsyncLabelRepository(self.db).existing_ids(
+            list({label_id for label_ids in label_id_lists if label_ids for label_id in label_ids}))
+
+    async def bulk_create_tasks(self, tasks_in: List[TaskCreate], owner_id: int) -> List[BulkItemResult]:
+        valid_labels = await self._valid_label_ids(t.label_ids for t in tasks_in)
+        rows = [{**t.model_dump(exclude={'label_ids'}), 'owner_id': owner_id} for t in tasks_in]
+        async with AsyncUnitOfWork(self.db):
+            ids = await self.repo.bulk_insert(rows)
+            await self.repo.bulk_replace_labels({
+                task_id: [label_id for label_id in t.label_ids if label_id in valid_labels]
+                for task_id, t in zip(ids, tasks_in) if t.label_ids
+            })
+            await self._bulk_activity_logs(owner_id, [
+                (task_id, "created", f"Task '{t.title}' created") for task_id, t in zip(ids, tasks_in)
+            ])
+            self._reschedule([(task_id, _schedulable_due(t.status, t.due_date))
+                              for task_id, t in zip(ids, tasks_in) if t.due_date])
+        await self._changed(owner_id, [change_event("task.created", task_id) for task_id in ids])
+        return [BulkItemResult(index=index, id=task_id, success=True) for index, task_id in enumerate(ids)]
+
+    async def bulk_update_tasks(self, items: List[TaskBulkUpdateItem], owner_id: int) -> List[BulkItemResult]:
+        tasks = {t.id: t for t in await self.repo.get_owned([item.id for item in items], owner_id)}
+        valid_labels = await self._valid_label_ids(item.label_ids for item in items)
+        now = datetime.utcnow()
+        rows, labels_by_task, logs, results, schedule, events = [], {}, [], [], [], []
+
+        for index, item in enumerate(items):
+            task = tasks.get(item.id)
+            if task is None:
+                results.append(BulkItemResult(index=index, id=item.id, success=False, detail="Task not found"))
+                continue
+            update_data = item.model_dump(exclude_unset=True, exclude={'id', 'label_ids'})
+            changes = _describe_changes(task, update_data)
+            # Same semantics as BaseRepository.update: None leaves the column untouched
+            values = {field: value for field, value in update_data.items() if value is not None}
+            rows.append({'id': task.id, **values, 'updated_at': now})
+            if item.label_ids is not None:
+                labels_by_task[task.id] = [label_id for label_id in item.label_ids if label_id in valid_labels]
+            if 'due_date' in values or 'status' in values:
+                schedule.append((task.id, _schedulable_due(values.get('status', task.status),
+                                                           values.get('due_date', task.due_date), task.is_deleted)))
+            events.append(change_event("task.updated", task.id, fields=_changed_fields(values, item.label_ids)))
+            title = values.get('title', task.title)
+            logs.append((task.id, "updated", ", ".join(changes) if changes else f"Task '{title}' updated"))
+            results.append(BulkItemResult(index=index, id=task.id, success=True))
+
+        async with AsyncUnitOfWork(self.db):
+            await self.repo.bulk_update(rows)
+            await self.repo.bulk_replace_labels(labels_by_task)
+            await self._bulk_activity_logs(owner_id, logs)
+            self._reschedule(schedule)
+        if rows:
+            await self._changed(owner_id, events)
+        return results
+
+    async def _bulk_set_deleted(self, ids: List[int], owner_id: int, deleted: bool) -> List[BulkItemResult]:
+        tasks = {t.id: t for t in await self.repo.get_owned(ids, owner_id)}
+        # Tasks already in the requested state are reported as no-ops: nothing is written, logged or published
+        found = [task_id for task_id in dict.fromkeys(ids) if task_id in tasks and tasks[task_id].is_deleted != deleted]
+        if found:
+            action = "deleted" if deleted else "restored"
+            async with AsyncUnitOfWork(self.db):
+                await self.repo.bulk_set_deleted(found, deleted)
+                await self._bulk_activity_logs(owner_id, [
+                    (task_id, action, f"Task '{tasks[task_id].title}' {action}") for task_id in found
+                ])
+                self._reschedule([(task_id, _schedulable_due(tasks[task_id].status, tasks[task_id].due_date, deleted))
+                                  for task_id in found])
+            await self._changed(owner_id, [change_event(f"task.{action}", task_id) for task_id in found])
+        changed = set(found)
+        unchanged = "Task is already deleted" if deleted else "Task is not deleted"
+        return [
+            BulkItemResult(index=index, id=task_id, success=True) if task_id in changed
+            else BulkItemResult(index=index, id=task_id, success=True, detail=unchanged) if task_id in tasks
+            else BulkItemResult(index=index, id=task_id, success=False, detail="Task not found")
+            for index, task_id in enumerate(ids)
+        ]
+
+    async def bulk_delete_tasks(self, ids: List[int], owner_id: int) -> List[BulkItemResult]:
+        return await self._bulk_set_deleted(ids, owner_id, deleted=True)
+
+    async def bulk_restore_tasks(self, ids: List[int], owner_id: int) -> List[BulkItemResult]:
+        return await self._bulk_set_deleted(ids, owner_id, deleted=False)
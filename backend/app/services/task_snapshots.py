@@ -0,0 +1,140 @@
+"""Per-task snapshots: each task's TaskResponse, rendered to JSON once and kept in Redis.
+
+A cached list page holds only task IDs. With the snapshots its tasks come back
+in one MGET and are spliced into the response as they are, so a warm list
+request runs no SQL and serializes nothing. Snapshots are written whenever a
+page is loaded from the database, and dropped once a write that changes what a
+task renders has committed: task writes (AsyncTaskService._changed), comments,
+activity logs (write-behind flushes included) and label edits.
+
+A read that raced a write must not store the old rendering after the drop.
+Every drop therefore takes a number from a global sequence and leaves it
+behind as the task's tombstone; a loader reads the sequence before it loads,
+and put() stores a snapshot only if the task's tombstone is not newer, checked
+and written in one WATCH/MULTI transaction so that no drop lands in between.
+"""
+from typing import Any, Callable, Iterable, List, Optional
+
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.core.metrics import cache_requests, redis_duration, timed
+from app.models.task import Task
+from app.schemas.task import TaskResponse
+
+
+class TaskSnapshotCache:
+    def __init__(self, redis: Callable[[], Any]):
+        # Resolved on every call, so a client swapped in after import (tests, benchmarks) is used
+        self._redis = redis
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.invalidations = 0
+        self.skipped = 0
+
+    SEQUENCE_KEY = "tasks:snapshot:seq"
+
+    @staticmethod
+    def key(task_id: int) -> str:
+        return f"tasks:snapshot:{task_id}"
+
+    @staticmethod
+    def tombstone_key(task_id: int) -> str:
+        return f"tasks:snapshot:{task_id}:dropped"
+
+    async def sequence(self) -> Optional[int]:
+        """Read before loading tasks, for put(); None if Redis fails (put() then stores nothing)"""
+        try:
+            return int(await self._redis().get(self.SEQUENCE_KEY) or 0)
+        except Exception as e:
+            print(f"Redis error during cache retrieval: {e}")
+            return None
+
+    @staticmethod
+    def render(task: Task) -> str:
+        """The task as the API returns it; needs the relationships of TaskLoad.LIST loaded"""
+        return TaskResponse.model_validate(task).model_dump_json()
+
+    async def get_many(self, task_ids: List[int]) -> List[Optional[str]]:
+        """Snapshots in the order of `task_ids`, None where missing (all None if Redis fails)"""
+        if not task_ids:
+            return []
+        try:
+            with timed(redis_duration, "task_snapshot"):
+                snapshots = await self._redis().mget([self.key(task_id) for task_id in task_ids])
+        except Exception as e:
+            cache_requests.inc("task_snapshot", "error")
+            print(f"Redis error during cache retrieval: {e}")
+            return [None] * len(task_ids)
+        missing = snapshots.count(None)
+        self.hits += len(snapshots) - missing
+        self.misses += missing
+        cache_requests.inc("task_snapshot", "hit", amount=len(snapshots) - missing)
+        cache_requests.inc("task_snapshot", "miss", amount=missing)
+        return snapshots
+
+    async def put(self, tasks: List[Task], since: Optional[int]) -> List[str]:
+        """Render `tasks` and return them in the same order, storing the snapshots of those
+        not dropped since `since`, the sequence() read before they were loaded"""
+        rendered = [self.render(task) for task in tasks]
+        if not tasks or since is None:
+            return rendered
+        tombstones = [self.tombstone_key(task.id) for task in tasks]
+        try:
+            async with self._redis().pipeline() as pipe:
+                await pipe.watch(*tombstones)
+                dropped = await pipe.mget(tombstones)
+                fresh = [(task, snapshot) for task, snapshot, seq in zip(tasks, rendered, dropped)
+                         if seq is None or int(seq) <= since]
+                self.skipped += len(tasks) - len(fresh)
+                pipe.multi()
+                for task, snapshot in fresh:
+                    pipe.setex(self.key(task.id), settings.TASK_SNAPSHOT_TTL, snapshot)
+                await pipe.execute()
+            self.writes += len(fresh)
+        except WatchError:
+            # Some task was dropped meanwhile; the next read stores them
+            self.skipped += len(tasks)
+        except Exception as e:
+            print(f"Redis error during cache set: {e}")
+        return rendered
+
+    async def invalidate(self, task_ids: Iterable[int]) -> None:
+        task_ids = set(task_ids)
+        if not task_ids:
+            return
+        try:
+            redis = self._redis()
+            seq = await redis.incr(self.SEQUENCE_KEY)
+            async with redis.pipeline(transaction=False) as pipe:
+                self._drop(pipe, task_ids, seq)
+                await pipe.execute()
+            self.invalidations += len(task_ids)
+        except Exception as e:
+            print(f"Redis error during cache invalidation: {e}")
+
+    def _drop(self, pipe, task_ids: set, seq: int) -> None:
+        # Tombstones only need to outlive the loads that started before them
+        for task_id in task_ids:
+            pipe.setex(self.tombstone_key(task_id), settings.TASK_SNAPSHOT_TTL, seq)
+        pipe.delete(*(self.key(task_id) for task_id in task_ids))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "writes": self.writes,
+            "skipped": self.skipped,
+            "invalidations": self.invalidations,
+        }
+
+
+def _redis():
+    from app.services import task_service
+    return task_service.async_redis_client
+
+
+task_snapshots = TaskSnapshotCache(_redis)
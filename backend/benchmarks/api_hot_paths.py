@@ -0,0 +1,283 @@
+"""Throughput and p50/p99 latency of the API hot paths, offline and reproducible.
+
+Drives the FastAPI app in-process through httpx's ASGI transport (startup and
+shutdown hooks included) against a scratch SQLite file, with fakeredis standing
+in for Redis. For every dataset size the database is rebuilt and seeded (with
+query_plans.seed), then each scenario is warmed up and timed:
+
+    list_cached     GET /tasks/, answered from the page cache
+    list_uncached   GET /tasks/ with both cache tiers flushed before each request (flush not timed)
+    search          GET /tasks/?search=...
+    create          POST /tasks/
+    update          PUT /tasks/{id}
+    login           POST /auth/login (bcrypt at BCRYPT_ROUNDS; see --login-requests)
+    comment         POST /comments/
+
+Results are written as JSON; with --baseline they are compared with an earlier
+run and the command exits with status 1 if any p50/p99 grew, or throughput
+fell, by more than --threshold. Compare runs from the same machine only.
+
+    cd backend
+    pip install -r requirements-dev.txt
+    python -m benchmarks.api_hot_paths --output baseline.json
+    python -m benchmarks.api_hot_paths --tasks 1000 20000 --baseline baseline.json --output current.json
+    python -m benchmarks.api_hot_paths --scenarios list_cached search --requests 1000
+"""
+import os
+import tempfile
+
+# Settings are read at import time, so the scratch database is chosen before the app is imported.
+# Assigned, not defaulted: the file is deleted and rebuilt for every dataset size.
+BENCH_DB = os.path.join(tempfile.gettempdir(), "api_hot_paths.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + BENCH_DB
+os.environ["STARTUP_MIGRATIONS"] = "never"
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["SQL_PROFILER"] = "false"
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import fakeredis
+import fastapi
+import httpx
+import sqlalchemy
+from sqlalchemy import select, update
+
+from app.main import app
+from app.core.auth_cache import principal_cache
+from app.core.config import settings
+from app.core.hashing import password_hasher
+from app.core.security import create_access_token, get_password_hash
+from app.core.tiered_cache import invalidation_bus
+from app.db.session import Base, async_engine, engine
+from app.models.task import Task
+from app.models.user import User
+from app.services import task_service
+from benchmarks.query_plans import seed
+
+PASSWORD = "bench-password"
+SCENARIOS = ("list_cached", "list_uncached", "search", "create", "update", "login", "comment")
+
+
+class Context:
+    """The seeded user the scenarios act as, and a request counter for unique payloads"""
+
+    def __init__(self, user_id: int, username: str, task_ids: list, search: str):
+        self.user_id = user_id
+        self.username = username
+        self.task_ids = task_ids
+        self.search = search
+        self.headers = {"Authorization": "Bearer " + create_access_token(data={"sub": user_id})}
+        self.counter = 0
+
+    def next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+async def flush_cache(ctx: Context) -> None:
+    await task_service.async_redis_client.flushdb()
+    invalidation_bus.clear_local()
+
+
+async def list_tasks(client, ctx: Context):
+    return await client.get("/api/v1/tasks/", params={"page": 1, "page_size": 20}, headers=ctx.headers)
+
+
+async def search_tasks(client, ctx: Context):
+    return await client.get("/api/v1/tasks/", params={"search": ctx.search, "page_size": 20}, headers=ctx.headers)
+
+
+async def create_task(client, ctx: Context):
+    return await client.post("/api/v1/tasks/", json={"title": f"bench task {ctx.next()}", "priority": "medium"},
+                             headers=ctx.headers)
+
+
+async def update_task(client, ctx: Context):
+    n = ctx.next()
+    task_id = ctx.task_ids[n % len(ctx.task_ids)]
+    return await client.put(f"/api/v1/tasks/{task_id}", json={"title": f"renamed {n}"}, headers=ctx.headers)
+
+
+async def login(client, ctx: Context):
+    return await client.post("/api/v1/auth/login", data={"username": ctx.username, "password": PASSWORD})
+
+
+async def add_comment(client, ctx: Context):
+    n = ctx.next()
+    return await client.post("/api/v1/comments/", json={"task_id": ctx.task_ids[n % len(ctx.task_ids)],
+                                                         "content": f"comment {n}"}, headers=ctx.headers)
+
+
+# name -> (request, untimed setup before each request or None)
+SCENARIO_CALLS = {
+    "list_cached": (list_tasks, None),
+    "list_uncached": (list_tasks, flush_cache),
+    "search": (search_tasks, None),
+    "create": (create_task, None),
+    "update": (update_task, None),
+    "login": (login, None),
+    "comment": (add_comment, None),
+}
+
+
+def prepare_database(users: int, tasks: int) -> Context:
+    engine.dispose()
+    if os.path.exists(BENCH_DB):
+        os.remove(BENCH_DB)
+    Base.metadata.create_all(bind=engine)
+    seed(engine, users, tasks)
+    with engine.begin() as conn:
+        user_id, username = conn.execute(select(User.id, User.username).order_by(User.id).limit(1)).one()
+        conn.execute(update(User).where(User.id == user_id).values(hashed_password=get_password_hash(PASSWORD),
+                                                                       full_name="Bench User"))
+        task_ids = list(conn.execute(select(Task.id).where(Task.owner_id == user_id, Task.is_deleted.is_(False))
+                                     .order_by(Task.id).limit(200)).scalars())
+    principal_cache.clear()
+    invalidation_bus.clear_local()
+    return Context(user_id, username, task_ids, search="task")
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "requests": len(ms),
+        "throughput_rps": round(len(ms) / elapsed, 1),
+        "p50_ms": round(statistics.median(ms), 3),
+        "p99_ms": round(statistics.quantiles(ms, n=100)[98], 3) if len(ms) > 1 else round(ms[0], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+async def run_scenario(client, ctx: Context, name: str, requests: int, warmup: int, concurrency: int) -> dict:
+    call, setup = SCENARIO_CALLS[name]
+    for _ in range(warmup):
+        if setup:
+            await setup(ctx)
+        (await call(client, ctx)).raise_for_status()
+
+    latencies = []
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if setup:
+                await setup(ctx)
+            started = time.perf_counter()
+            response = await call(client, ctx)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run_size(args, tasks: int) -> dict:
+    ctx = prepare_database(args.users, tasks)
+    await task_service.async_redis_client.flushdb()
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        # Process-pool workers import the app as they boot; let them finish before anything is timed
+        await asyncio.gather(*(password_hasher.verify("", "") for _ in range(password_hasher.workers)))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.scenarios:
+                requests = args.login_requests if name == "login" else args.requests
+                results[name] = await run_scenario(client, ctx, name, requests, args.warmup, args.concurrency)
+                r = results[name]
+                print(f"  {name:<14} {r['throughput_rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  "
+                      f"p99 {r['p99_ms']:>8.2f} ms", file=sys.stderr)
+    # Pooled connections belong to this event loop; the next size runs on a new one
+    await async_engine.dispose()
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fastapi": fastapi.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Lines describing each scenario against the baseline; regressions are prefixed with REGRESSION"""
+    lines = []
+    for size, scenarios in current["results"].items():
+        for name, now in scenarios.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if before is None:
+                lines.append(f"        tasks={size} {name}: not in baseline")
+                continue
+            changes = {key: now[key] / before[key] - 1 if before[key] else 0.0
+                       for key in ("p50_ms", "p99_ms", "throughput_rps")}
+            regressed = (changes["p50_ms"] > threshold or changes["p99_ms"] > threshold
+                         or changes["throughput_rps"] < -threshold)
+            lines.append(f"{'REGRESSION' if regressed else '        ok'} tasks={size} {name}: "
+                         + ", ".join(f"{key} {before[key]} -> {now[key]} ({change:+.1%})"
+                                     for key, change in changes.items()))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1000, 10000], help="dataset sizes to run")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=300, help="timed requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=30, help="timed logins; each costs a bcrypt verify")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1, help="requests in flight at once")
+    parser.add_argument("--output", help="write results as JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    server = fakeredis.FakeServer()
+    task_service.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    task_service.async_redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+    report = {"environment": environment(), "config": vars(args).copy(), "results": {}}
+    report["config"].pop("output")
+    report["config"].pop("baseline")
+    for tasks in args.tasks:
+        print(f"tasks={tasks}, users={args.users}", file=sys.stderr)
+        report["results"][str(tasks)] = asyncio.run(run_size(args, tasks))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            lines = compare(report, json.load(f), args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        if any(line.startswith("REGRESSION") for line in lines):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Per-request and per-statement cost of app.core.metrics.
+
+Drives a one-route ASGI app directly (no HTTP, no test client) with and without
+MetricsMiddleware, runs SELECT 1 on an in-memory SQLite engine with and without
+the statement listeners, and times a bare Histogram.observe. The difference of
+the medians is the overhead the instrumentation adds.
+
+    cd backend
+    python -m benchmarks.metrics_overhead
+    python -m benchmarks.metrics_overhead --requests 50000 --repeat 7
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import Histogram, MetricsMiddleware, instrument_engine
+
+
+def bare_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    """Seconds to serve `requests` GETs by calling the ASGI app directly"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for i in range(requests):
+        path = f"/items/{i}"
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+                 "headers": [], "client": ("bench", 1), "server": ("bench", 80)}
+        await app(scope, receive, send)
+    return time.perf_counter() - started
+
+
+def median_us_per_request(app, requests: int, repeat: int) -> float:
+    return statistics.median(asyncio.run(drive(app, requests)) for _ in range(repeat)) / requests * 1e6
+
+
+def median_us_per_statement(engine, statements: int, repeat: int) -> float:
+    timings = []
+    with engine.connect() as conn:
+        stmt = text("SELECT 1")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(statements):
+                conn.execute(stmt)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings) / statements * 1e6
+
+
+def median_ns_per_observe(observations: int, repeat: int) -> float:
+    histogram = Histogram("bench_seconds", "benchmark", ("route",))
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for i in range(observations):
+            histogram.observe(0.004, "/items/{item_id}")
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) / observations * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    plain = median_us_per_request(bare_app(), args.requests, args.repeat)
+    measured = median_us_per_request(MetricsMiddleware(bare_app()), args.requests, args.repeat)
+    print(f"request:   {plain:8.2f} us bare, {measured:8.2f} us with middleware, +{measured - plain:.2f} us")
+
+    bare_engine = create_engine("sqlite://")
+    instrumented_engine = create_engine("sqlite://")
+    instrument_engine(instrumented_engine, "bench")
+    plain = median_us_per_statement(bare_engine, args.statements, args.repeat)
+    measured = median_us_per_statement(instrumented_engine, args.statements, args.repeat)
+    print(f"statement: {plain:8.2f} us bare, {measured:8.2f} us with listeners,  +{measured - plain:.2f} us")
+
+    print(f"observe:   {median_ns_per_observe(args.requests * 10, args.repeat):8.0f} ns per Histogram.observe")
+
+
+if __name__ == "__main__":
+    main()
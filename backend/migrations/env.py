@@ -53,6 +53,14 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # Called in-process (app.db.migrate) with an open connection; the caller commits
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     configuration = config.get_section(config.config_ini_section, {})
     if os.environ.get("DATABASE_URL"):
         configuration["sqlalchemy.url"] = os.environ.get("DATABASE_URL")
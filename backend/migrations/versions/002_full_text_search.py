@@ -0,0 +1,26 @@
+"""Full-text search index for tasks
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+from app.db import fulltext
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Postgres: generated tsvector column (backfilled by the ALTER) + GIN index
+    # SQLite: FTS5 external-content table + sync triggers, then a rebuild to backfill
+    fulltext.install(op.get_bind())
+
+
+def downgrade() -> None:
+    fulltext.uninstall(op.get_bind())
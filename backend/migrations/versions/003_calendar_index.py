@@ -0,0 +1,23 @@
+"""Composite index for the task calendar
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # /tasks/calendar filters on owner_id and is_deleted and ranges over due_date
+    op.create_index('ix_tasks_owner_deleted_due', 'tasks', ['owner_id', 'is_deleted', 'due_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_owner_deleted_due', table_name='tasks')
@@ -0,0 +1,37 @@
+"""Composite and partial indexes matching the owner-first query shapes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Task listing: WHERE owner_id = ? AND NOT is_deleted ORDER BY created_at, id (either direction)
+    op.create_index('ix_tasks_owner_created_live', 'tasks', ['owner_id', 'created_at', 'id'], unique=False,
+                    postgresql_where=sa.text('is_deleted = false'), sqlite_where=sa.text('is_deleted = 0'))
+    # Activity feed per user, and per-task activity/comments loaded alongside task pages
+    op.create_index('ix_activity_logs_user_created', 'activity_logs', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_activity_logs_task_created', 'activity_logs', ['task_id', 'created_at'], unique=False)
+    op.create_index('ix_comments_task_created', 'comments', ['task_id', 'created_at'], unique=False)
+    op.create_index('ix_comments_user_created', 'comments', ['user_id', 'created_at'], unique=False)
+    # Label filters; the (task_id, label_id) primary key only serves the task -> labels direction
+    op.create_index('ix_task_labels_label_task', 'task_labels', ['label_id', 'task_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_labels_label_task', table_name='task_labels')
+    op.drop_index('ix_comments_user_created', table_name='comments')
+    op.drop_index('ix_comments_task_created', table_name='comments')
+    op.drop_index('ix_activity_logs_task_created', table_name='activity_logs')
+    op.drop_index('ix_activity_logs_user_created', table_name='activity_logs')
+    op.drop_index('ix_tasks_owner_created_live', table_name='tasks')
@@ -0,0 +1,23 @@
+"""Overdue notification ledger
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('overdue_notified_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tasks', 'overdue_notified_at')
@@ -1,107 +1,263 @@
-from app.db.session import SessionLocal
-from app.models.user import User, UserRole
-from app.models.task import Task, TaskStatus, TaskPriority
-from app.models.label import Label
-from app.core.security import get_password_hash
+"""Synthetic dataset generator: users with tasks, labels, comments and activity.
+
+Without arguments it creates the demo account (demouser / demo123) with a
+realistic task list, and does nothing if that account already exists. With --users it builds datasets for load and index
+testing: tasks per user follow a long-tailed distribution, a --power-users
+share of the accounts gets --power-factor times as many, and every user's data
+comes from its own RNG seeded with --seed, so a run is reproducible and the
+same seed yields the same users at any --users count (timestamps are anchored
+at the current time).
+
+Rows are generated in chunks of --chunk-users users and bulk-loaded: COPY on
+Postgres (psycopg2 or psycopg 3), executemany elsewhere (SQLite). IDs are
+allocated after the current maximum, so a database can be seeded more than once.
+
+    cd backend
+    python seed_data.py
+    python seed_data.py --users 100000 --seed 7              # ~24M rows
+    python seed_data.py --users 1000 --tasks-per-user 200 --power-users 0.05 --power-factor 40
+"""
+import argparse
+import csv
+import io
+import math
+import random
+import time
 from datetime import datetime, timedelta
+from enum import Enum
+
+from sqlalchemy import func, insert, select, text
+
+from app.core.security import get_password_hash
+from app.db.session import Base, engine
+from app.models.user import User, UserRole
+from app.models.task import Task, TaskStatus, TaskPriority, task_labels
+from app.models.label import Label, Comment, ActivityLog
+
+DEMO_USERNAME = "demouser"
+DEMO_EMAIL = "demo@taskmanager.com"
+
+VERBS = ["Review", "Draft", "Fix", "Update", "Plan", "Write", "Prepare", "Schedule", "Research", "Refactor",
+         "Test", "Deploy", "Design", "Document", "Organize", "Call", "Email", "Book", "Renew", "Clean up"]
+OBJECTS = ["project proposal", "landing page", "authentication bug", "quarterly budget", "team meeting notes",
+           "API documentation", "onboarding checklist", "release notes", "database migration", "invoice",
+           "dentist appointment", "flight to Berlin", "grocery list", "car insurance", "blog post", "pull request",
+           "design mockups", "customer feedback", "performance report", "backup strategy", "sprint retrospective",
+           "tax return", "birthday present", "conference talk", "hiring plan", "security audit"]
+DETAILS = ["before the deadline", "with the design team", "for the Q3 planning", "and share it with the client",
+           "including budget estimates", "in the staging environment", "after the standup", "for the board meeting",
+           "and collect feedback", "with updated screenshots", "for next week", "and close the ticket"]
+LABELS = [("Work", "#3b82f6"), ("Personal", "#10b981"), ("Urgent", "#ef4444"), ("Design", "#8b5cf6"),
+          ("Development", "#f59e0b"), ("Finance", "#14b8a6"), ("Health", "#ec4899"), ("Home", "#84cc16"),
+          ("Errands", "#f97316"), ("Learning", "#06b6d4"), ("Travel", "#6366f1"), ("Someday", "#64748b")]
+COMMENTS = ["Started on this today.", "Blocked until the review is done.", "Moved the deadline by a week.",
+            "Done, waiting for confirmation.", "Needs another pass.", "Discussed in the weekly sync.",
+            "Added the missing details.", "Can we split this into smaller tasks?", "Looks good to me."]
+
+STATUSES = [TaskStatus.TODO, TaskStatus.IN_PROGRESS, TaskStatus.COMPLETED, TaskStatus.ARCHIVED]
+STATUS_WEIGHTS = [35, 20, 38, 7]
+PRIORITIES = [TaskPriority.LOW, TaskPriority.MEDIUM, TaskPriority.HIGH]
+PRIORITY_WEIGHTS = [30, 50, 20]
+LABELS_PER_TASK = [0, 1, 2, 3]
+LABELS_PER_TASK_WEIGHTS = [40, 35, 18, 7]
+
+# Parents before children, so foreign keys hold at every point of the load
+LOAD_ORDER = [User.__table__, Label.__table__, Task.__table__, task_labels, Comment.__table__, ActivityLog.__table__]
+
+
+class IdAllocator:
+    """Hands out primary keys after the highest existing one, so rows can be loaded with explicit ids"""
+
+    def __init__(self, conn):
+        self.next = {table: (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+                     for table in LOAD_ORDER if "id" in table.c}
+
+    def take(self, table) -> int:
+        value = self.next[table]
+        self.next[table] = value + 1
+        return value
+
+
+def _count(rng: random.Random, mean: float) -> int:
+    """Long-tailed count with the given mean: most values small, a few large"""
+    if mean <= 0:
+        return 0
+    sigma = 1.0
+    return int(rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma))
+
+
+def generate_user(rng: random.Random, args, ids: IdAllocator, rows: dict, password_hash: str, now: datetime,
+                  username: str = None, email: str = None) -> None:
+    """Append one user and everything it owns to `rows` (table -> list of row dicts)"""
+    user_id = ids.take(User.__table__)
+    joined = now - timedelta(days=rng.uniform(1, args.days))
+    # Drawn for every user so the rest of the dataset does not depend on it; a named account (the demo
+    # login) is always active
+    active = rng.random() > 0.01 or username is not None
+    rows[User.__table__].append({
+        "id": user_id, "email": email or f"user{user_id}@example.com", "username": username or f"user{user_id}",
+        "hashed_password": password_hash, "full_name": f"User {user_id}", "role": UserRole.USER,
+        "is_active": active, "created_at": joined, "updated_at": joined,
+    })
+
+    power = rng.random() < args.power_users
+    label_ids = []
+    for name, color in rng.sample(LABELS, min(len(LABELS), _count(rng, args.labels_per_user) + (4 if power else 0))):
+        label_id = ids.take(Label.__table__)
+        label_ids.append(label_id)
+        rows[Label.__table__].append({"id": label_id, "name": name, "color": color, "created_by": user_id,
+                                      "created_at": joined})
+
+    tasks = _count(rng, args.tasks_per_user * (args.power_factor if power else 1))
+    span = (now - joined).total_seconds()
+    for _ in range(tasks):
+        task_id = ids.take(Task.__table__)
+        created = joined + timedelta(seconds=rng.uniform(0, span))
+        updated = created + timedelta(seconds=rng.uniform(0, (now - created).total_seconds()))
+        title = f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}"
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        deleted = rng.random() < args.deleted_share
+        rows[Task.__table__].append({
+            "id": task_id, "title": title,
+            "description": f"{title} {rng.choice(DETAILS)}." if rng.random() < 0.6 else None,
+            "status": status, "priority": rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+            "due_date": created + timedelta(days=rng.randint(-3, 45)) if rng.random() < 0.65 else None,
+            "is_deleted": deleted, "deleted_at": updated if deleted else None, "overdue_notified_at": None,
+            "created_at": created, "updated_at": updated, "owner_id": user_id,
+        })
+        k = min(len(label_ids), rng.choices(LABELS_PER_TASK, LABELS_PER_TASK_WEIGHTS)[0])
+        for label_id in rng.sample(label_ids, k):
+            rows[task_labels].append({"task_id": task_id, "label_id": label_id})
+
+        activity = [("created", f"Task '{title}' created", created)]
+        for _ in range(_count(rng, args.activity_per_task)):
+            activity.append(("updated", f"Task '{title}' updated", created + (updated - created) * rng.random()))
+        for _ in range(_count(rng, args.comments_per_task)):
+            at = created + (updated - created) * rng.random()
+            rows[Comment.__table__].append({"id": ids.take(Comment.__table__), "content": rng.choice(COMMENTS),
+                                            "created_at": at, "task_id": task_id, "user_id": user_id})
+            activity.append(("comment_added", f'💬 {username or f"user{user_id}"} added a comment on "{title}"', at))
+        if deleted:
+            activity.append(("deleted", f"Task '{title}' deleted", updated))
+        for action, description, at in activity:
+            rows[ActivityLog.__table__].append({"id": ids.take(ActivityLog.__table__), "action": action,
+                                                "description": description, "created_at": at,
+                                                "task_id": task_id, "user_id": user_id})
+
+
+def _copy_value(value):
+    # Postgres enum types hold SQLAlchemy's Enum names, not the str values
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return value  # None becomes an unquoted empty field, i.e. NULL
+
+
+def load(conn, table, rows: list) -> None:
+    """COPY `rows` into `table` on Postgres (psycopg2 or psycopg 3), executemany anywhere else"""
+    if not rows:
+        return
+    if conn.dialect.name != "postgresql":
+        conn.execute(insert(table), rows)
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+        else:
+            with cursor.copy(statement) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def reset_sequences(conn) -> None:
+    """Explicit ids bypass Postgres sequences; move them past the loaded rows"""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in LOAD_ORDER:
+        if "id" in table.c:
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                              f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, help="users to create; the first is the demo account unless it exists "
+                                                    "(default: just the demo account)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tasks-per-user", type=float, default=40, help="mean tasks of a regular user")
+    parser.add_argument("--labels-per-user", type=float, default=4)
+    parser.add_argument("--comments-per-task", type=float, default=0.6)
+    parser.add_argument("--activity-per-task", type=float, default=1.5, help="mean updates logged per task")
+    parser.add_argument("--power-users", type=float, default=0.02, help="share of users with many more tasks")
+    parser.add_argument("--power-factor", type=float, default=25, help="task multiplier of power users")
+    parser.add_argument("--deleted-share", type=float, default=0.03, help="share of tasks in the trash")
+    parser.add_argument("--days", type=int, default=730, help="history length in days")
+    parser.add_argument("--password", default="demo123", help="password of every generated user")
+    parser.add_argument("--chunk-users", type=int, default=1000, help="users generated and committed per batch")
+    parser.add_argument("--create-schema", action="store_true", help="create missing tables first (no alembic)")
+    args = parser.parse_args()
+
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        demo_exists = conn.execute(select(User.id).where(User.username == DEMO_USERNAME)).first() is not None
+    if args.users is None:
+        # The plain run only sets up the demo login; rerunning it must not add random accounts
+        if demo_exists:
+            print(f"✅ {DEMO_USERNAME} already exists, nothing to seed (pass --users to add more)")
+            return
+        args.users = 1
+
+    print(f"🌱 Seeding {args.users} users into {engine.url.render_as_string(hide_password=True)} (seed {args.seed})...")
+    # One bcrypt hash for everyone: at BCRYPT_ROUNDS a hash per user would dominate the run
+    password_hash = get_password_hash(args.password)
+    now = datetime.utcnow()
+    with engine.connect() as conn:
+        ids = IdAllocator(conn)
+
+    started = time.perf_counter()
+    totals = {table.name: 0 for table in LOAD_ORDER}
+    for first in range(0, args.users, args.chunk_users):
+        rows = {table: [] for table in LOAD_ORDER}
+        for n in range(first, min(first + args.chunk_users, args.users)):
+            rng = random.Random(f"{args.seed}:{n}")
+            if n == 0 and not demo_exists:
+                generate_user(rng, args, ids, rows, password_hash, now, username=DEMO_USERNAME, email=DEMO_EMAIL)
+            else:
+                generate_user(rng, args, ids, rows, password_hash, now)
+        with engine.begin() as conn:
+            for table in LOAD_ORDER:
+                load(conn, table, rows[table])
+                totals[table.name] += len(rows[table])
+        done = min(first + args.chunk_users, args.users)
+        elapsed = time.perf_counter() - started
+        print(f"  {done}/{args.users} users, {sum(totals.values())} rows, "
+              f"{sum(totals.values()) / elapsed:.0f} rows/s")
+
+    with engine.begin() as conn:
+        reset_sequences(conn)
+        conn.execute(text("ANALYZE"))
+
+    print(f"✅ Loaded in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{count} {name}" for name, count in totals.items()))
+    if not demo_exists:
+        print("\n📧 Demo Login Credentials:")
+        print(f"   Email:    {DEMO_EMAIL}")
+        print(f"   Username: {DEMO_USERNAME}")
+        print(f"   Password: {args.password}")
+    print("\n🚀 Start the backend server:")
+    print("   uvicorn app.main:app --reload")
+
 
-db = SessionLocal()
-
-print("🌱 Seeding database...")
-
-demo_user = User(
-    email="demo@taskmanager.com",
-    username="demouser",
-    hashed_password=get_password_hash("demo123"),
-    full_name="Demo User",
-    role=UserRole.USER
-)
-db.add(demo_user)
-db.commit()
-db.refresh(demo_user)
-print(f"✅ Created user: {demo_user.username}")
-
-labels = [
-    Label(name="Work", color="#3b82f6", created_by=demo_user.id),
-    Label(name="Personal", color="#10b981", created_by=demo_user.id),
-    Label(name="Urgent", color="#ef4444", created_by=demo_user.id),
-    Label(name="Design", color="#8b5cf6", created_by=demo_user.id),
-    Label(name="Development", color="#f59e0b", created_by=demo_user.id),
-]
-for label in labels:
-    db.add(label)
-db.commit()
-print(f"✅ Created {len(labels)} labels")
-
-tasks = [
-    Task(
-        title="Complete project proposal",
-        description="Draft and finalize Q1 project proposal with budget estimates",
-        status=TaskStatus.IN_PROGRESS,
-        priority=TaskPriority.HIGH,
-        due_date=datetime.now() + timedelta(days=3),
-        owner_id=demo_user.id
-    ),
-    Task(
-        title="Design new landing page",
-        description="Create mockups for homepage redesign with modern UI",
-        status=TaskStatus.TODO,
-        priority=TaskPriority.MEDIUM,
-        due_date=datetime.now() + timedelta(days=7),
-        owner_id=demo_user.id
-    ),
-    Task(
-        title="Fix authentication bug",
-        description="Resolve JWT token refresh issues in production",
-        status=TaskStatus.TODO,
-        priority=TaskPriority.HIGH,
-        due_date=datetime.now() + timedelta(days=1),
-        owner_id=demo_user.id
-    ),
-    Task(
-        title="Weekly team meeting notes",
-        description="Document action items from team sync meeting",
-        status=TaskStatus.COMPLETED,
-        priority=TaskPriority.LOW,
-        owner_id=demo_user.id
-    ),
-    Task(
-        title="Update documentation",
-        description="Add API documentation for new endpoints",
-        status=TaskStatus.TODO,
-        priority=TaskPriority.MEDIUM,
-        due_date=datetime.now() + timedelta(days=5),
-        owner_id=demo_user.id
-    ),
-]
-
-for i, task in enumerate(tasks):
-    db.add(task)
-    db.commit()
-    db.refresh(task)
-    
-    if i < 3:
-        task.labels = [labels[0], labels[2]]
-    elif i == 3:
-        task.labels = [labels[1]]
-    else:
-        task.labels = [labels[4]]
-    
-    db.commit()
-
-print(f"✅ Created {len(tasks)} tasks")
-
-print("\n" + "="*50)
-print("✅ SEED DATA CREATED SUCCESSFULLY!")
-print("="*50)
-print("\n📧 Demo Login Credentials:")
-print("   Email:    demo@taskmanager.com")
-print("   Username: demouser")
-print("   Password: demo123")
-print("\n🚀 Start the backend server:")
-print("   uvicorn app.main:app --reload")
-print("\n📚 API Documentation:")
-print("   http://localhost:8000/docs")
-print("="*50 + "\n")
-
-db.close()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
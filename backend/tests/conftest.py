@@ -0,0 +1,65 @@
+"""Shared fixtures: a scratch SQLite database and fakeredis in place of Redis.
+
+Settings are read when the app is imported, so the environment is set first.
+"""
+import os
+import tempfile
+
+TEST_DB = os.path.join(tempfile.gettempdir(), "task_manager_tests.db")
+if os.path.exists(TEST_DB):
+    os.remove(TEST_DB)
+os.environ["DATABASE_URL"] = "sqlite:///" + TEST_DB
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["HASH_PROCESS_POOL"] = "0"
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.auth_cache import principal_cache
+from app.core.tiered_cache import invalidation_bus
+from app.db.session import Base, SessionLocal, engine
+from app.services import task_service
+
+
+@pytest.fixture(scope="session")
+def schema():
+    Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db_session(schema):
+    """Empty tables for every test. Emptied rather than recreated: pooled async connections keep the file open"""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(task_service, "redis_client", fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(task_service, "async_redis_client",
+                        fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    principal_cache.clear()
+    invalidation_bus.clear_local()
+    return task_service.redis_client
+
+
+@pytest.fixture
+def client(db_session, redis):
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post("/api/v1/auth/signup", json={"email": "owner@example.com", "username": "owner",
+                                                        "password": "secret", "full_name": "Owner"})
+    assert response.status_code == 201, response.text
+    return {"Authorization": "Bearer " + response.json()["access_token"]}
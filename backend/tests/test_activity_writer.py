@@ -0,0 +1,55 @@
+"""Write-behind activity log: failed flushes are retried, and only rejected rows are dropped"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import activity_events
+from app.models.label import ActivityLog
+from app.services.activity_writer import ActivityLogWriter
+
+
+@pytest.fixture
+def writer(db_session, redis, monkeypatch):
+    monkeypatch.setattr(settings, "ACTIVITY_RETRY_BACKOFF", 0)
+    return ActivityLogWriter(queue_size=100, batch_size=10, flush_interval=0.01)
+
+
+def _rows(task_ids):
+    return [{"task_id": task_id, "user_id": 1, "action": "updated", "description": "d",
+             "created_at": datetime.utcnow()} for task_id in task_ids]
+
+
+def test_transient_failure_is_retried(writer, db_session, monkeypatch):
+    insert = writer._insert
+    failures = iter([True, True])
+
+    async def flaky(rows):
+        if next(failures, False):
+            raise ConnectionError("database restarting")
+        await insert(rows)
+    monkeypatch.setattr(writer, "_insert", flaky)
+
+    asyncio.run(writer._flush(_rows([1, 2])))
+
+    assert (writer.written, writer.retries, writer.failed) == (2, 2, 0)
+    assert db_session.query(ActivityLog).count() == 2
+
+
+def test_only_rejected_rows_are_dropped(writer, db_session, monkeypatch):
+    insert = writer._insert
+
+    async def rejecting(rows):
+        if any(row["task_id"] == 13 for row in rows):
+            raise ValueError("foreign key violation")
+        await insert(rows)
+    monkeypatch.setattr(writer, "_insert", rejecting)
+    dropped_before = activity_events.value("dropped")
+
+    asyncio.run(writer._flush(_rows([1, 13, 2])))
+
+    assert (writer.written, writer.failed) == (2, 1)
+    assert writer.retries == settings.ACTIVITY_FLUSH_RETRIES
+    assert activity_events.value("dropped") == dropped_before + 1
+    assert sorted(log.task_id for log in db_session.query(ActivityLog)) == [1, 2]
@@ -0,0 +1,26 @@
+"""Bulk delete and restore act only on tasks whose state changes"""
+from app.models.label import ActivityLog
+
+
+def test_restoring_a_live_task_is_a_no_op(client, auth_headers, db_session):
+    live = client.post("/api/v1/tasks/", json={"title": "live"}, headers=auth_headers).json()["id"]
+    gone = client.post("/api/v1/tasks/", json={"title": "gone"}, headers=auth_headers).json()["id"]
+    client.delete(f"/api/v1/tasks/{gone}", headers=auth_headers)
+
+    response = client.post("/api/v1/tasks/bulk/restore", json={"ids": [live, gone, 999999]}, headers=auth_headers)
+
+    results = response.json()["results"]
+    assert [(r["id"], r["success"], r["detail"]) for r in results] == [
+        (live, True, "Task is not deleted"), (gone, True, None), (999999, False, "Task not found")]
+    restored = db_session.query(ActivityLog).filter(ActivityLog.action == "restored").all()
+    assert [log.task_id for log in restored] == [gone]
+
+
+def test_deleting_a_deleted_task_is_a_no_op(client, auth_headers, db_session):
+    task_id = client.post("/api/v1/tasks/", json={"title": "t"}, headers=auth_headers).json()["id"]
+    client.post("/api/v1/tasks/bulk/delete", json={"ids": [task_id]}, headers=auth_headers)
+
+    result = client.post("/api/v1/tasks/bulk/delete", json={"ids": [task_id]}, headers=auth_headers).json()["results"][0]
+
+    assert (result["success"], result["detail"]) == (True, "Task is already deleted")
+    assert db_session.query(ActivityLog).filter(ActivityLog.action == "deleted").count() == 1
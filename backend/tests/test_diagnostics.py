@@ -0,0 +1,39 @@
+"""/metrics and /stats/* are for admins; a scraper may read /metrics with METRICS_TOKEN"""
+import pytest
+
+from app.core.config import settings
+from app.models.user import User, UserRole
+
+STATS = ["/stats/auth-cache", "/stats/task-cache", "/stats/caches", "/stats/activity-writer", "/stats/scheduler",
+         "/stats/stream", "/stats/hashing", "/stats/db-pool", "/stats/startup"]
+
+
+@pytest.fixture
+def admin_headers(client, db_session):
+    response = client.post("/api/v1/auth/signup", json={"email": "admin@example.com", "username": "admin",
+                                                        "password": "secret", "full_name": "Admin"})
+    db_session.query(User).filter(User.username == "admin").update({"role": UserRole.ADMIN})
+    db_session.commit()
+    return {"Authorization": "Bearer " + response.json()["access_token"]}
+
+
+@pytest.mark.parametrize("path", STATS + ["/metrics"])
+def test_only_admins_read_diagnostics(client, auth_headers, admin_headers, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=auth_headers).status_code == 403
+    assert client.get(path, headers=admin_headers).status_code == 200
+
+
+def test_scraper_reads_metrics_with_the_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-me")
+
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
+    assert client.get("/metrics", headers={"Authorization": "Bearer guess"}).status_code == 401
+    assert client.get("/stats/db-pool", headers={"Authorization": "Bearer scrape-me"}).status_code == 401
+
+
+def test_sql_profile_is_not_mounted_without_the_profiler(client, admin_headers):
+    # It lists request paths and statement shapes, so it only exists where SQL_PROFILER runs
+    assert not settings.SQL_PROFILER
+    assert client.get("/stats/sql-profile").status_code == 404
+    assert client.get("/stats/sql-profile", headers=admin_headers).status_code == 404
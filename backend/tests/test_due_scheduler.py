@@ -0,0 +1,82 @@
+"""Due-date scheduler: slow listeners, missed firings and step-down cleanup"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.task import Task, TaskStatus
+from app.models.user import User
+from app.services import task_service
+from app.services.due_scheduler import LEASE_KEY, DueDateScheduler
+
+
+@pytest.fixture
+def owner_id(db_session):
+    user = User(email="owner@example.com", username="owner", hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    return user.id
+
+
+def _add_task(db, owner_id, title, due_date, **fields):
+    task = Task(title=title, owner_id=owner_id, due_date=due_date, **fields)
+    db.add(task)
+    db.commit()
+    return task.id
+
+
+def test_a_slow_listener_does_not_hold_up_lease_renewal(db_session, redis, owner_id):
+    _add_task(db_session, owner_id, "late", datetime.utcnow() - timedelta(minutes=1))
+    scheduler = DueDateScheduler(horizon=3600, max_loaded=1000, lease_ttl=1)
+
+    async def run():
+        done = asyncio.Event()
+        calls = []
+
+        async def slow_digest(tasks):
+            calls.append([task.title for task in tasks])
+            await done.wait()
+        scheduler.add_listener(slow_digest)
+
+        await scheduler.start(task_service.async_redis_client)
+        try:
+            # Well past the lease TTL while the listener is still running
+            await asyncio.sleep(1.8)
+            assert calls == [["late"]]
+            assert scheduler.stats()["notifying"] == 1
+            assert await task_service.async_redis_client.get(LEASE_KEY) == scheduler.worker_id
+            done.set()
+        finally:
+            await scheduler.stop()
+        assert scheduler.stats()["notifying"] == 0
+    asyncio.run(run())
+
+
+def test_a_new_leader_fires_what_fell_due_while_no_leader_was_alive(db_session, redis, owner_id):
+    long_ago = datetime.utcnow() - timedelta(hours=2)
+    missed = _add_task(db_session, owner_id, "missed", long_ago)
+    _add_task(db_session, owner_id, "notified", long_ago, overdue_notified_at=long_ago + timedelta(minutes=1))
+    _add_task(db_session, owner_id, "done", long_ago, status=TaskStatus.COMPLETED)
+    scheduler = DueDateScheduler(horizon=3600, max_loaded=1000, lease_ttl=30)
+
+    async def run():
+        scheduler.redis = task_service.async_redis_client
+        await scheduler._become_leader()
+        try:
+            assert scheduler._pop_due(datetime.utcnow()) == [missed]
+        finally:
+            await scheduler._step_down()
+    asyncio.run(run())
+
+
+def test_step_down_waits_for_the_subscriber_to_close(db_session, redis):
+    scheduler = DueDateScheduler(horizon=3600, max_loaded=1000, lease_ttl=30)
+
+    async def run():
+        scheduler.redis = task_service.async_redis_client
+        await scheduler._become_leader()
+        subscriber = scheduler._subscriber
+        await asyncio.sleep(0)
+        await scheduler._step_down()
+        assert subscriber.done()
+    asyncio.run(run())
@@ -0,0 +1,107 @@
+"""Overdue digest job against a local SMTP stand-in (aiosmtpd)"""
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.core.config import settings
+from app.models.task import Task, TaskStatus
+from app.models.user import User
+from app.services.email_service import EmailNotificationService, SMTPConnectionPool
+
+POOL_SIZE = 2
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        # Session objects are kept, not their ids, so every SMTP connection stays distinct
+        self.sessions = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.rcpt_tos)
+        if not any(s is session for s in self.sessions):
+            self.sessions.append(session)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        yield handler, port
+    finally:
+        controller.stop()
+
+
+@pytest.fixture
+def service(smtp):
+    _, port = smtp
+    service = EmailNotificationService()
+    service.smtp_server = "127.0.0.1"
+    service.smtp_port = port
+    service.use_tls = False
+    service.from_email = "tasks@example.com"
+    service.pool = SMTPConnectionPool("127.0.0.1", port, None, None, False, POOL_SIZE)
+    yield service
+    service.pool.close()
+
+
+@pytest.fixture
+def overdue(db_session, monkeypatch):
+    """Five users with 1..5 overdue tasks each, plus tasks that must not be mailed"""
+    # Several batches, so connections have to outlive a batch to be reused
+    monkeypatch.setattr(settings, "NOTIFY_USERS_PER_BATCH", 2)
+    past = datetime.utcnow() - timedelta(days=1)
+    future = datetime.utcnow() + timedelta(days=1)
+    for n in range(5):
+        user = User(email=f"user{n}@example.com", username=f"user{n}", hashed_password="x")
+        db_session.add(user)
+        db_session.flush()
+        db_session.add_all([Task(title=f"late {i}", due_date=past, owner_id=user.id) for i in range(n + 1)])
+        db_session.add_all([
+            Task(title="not due", due_date=future, owner_id=user.id),
+            Task(title="done", due_date=past, status=TaskStatus.COMPLETED, owner_id=user.id),
+            Task(title="deleted", due_date=past, is_deleted=True, owner_id=user.id),
+        ])
+    db_session.commit()
+    return db_session
+
+
+def test_each_user_gets_exactly_one_digest(service, smtp, overdue):
+    handler, _ = smtp
+    result = service.check_and_notify_overdue_tasks(overdue)
+
+    assert result == {"users_notified": 5, "tasks_notified": 15, "failed": 0}
+    assert sorted(rcpt for rcpts in handler.messages for rcpt in rcpts) == [f"user{n}@example.com" for n in range(5)]
+
+
+def test_ledger_stops_a_second_run_from_re_mailing(service, smtp, overdue):
+    handler, _ = smtp
+    service.check_and_notify_overdue_tasks(overdue)
+    second = service.check_and_notify_overdue_tasks(overdue)
+
+    assert second == {"users_notified": 0, "tasks_notified": 0, "failed": 0}
+    assert len(handler.messages) == 5
+
+    # A task whose due date moved past its last notification is re-armed, alone
+    task = overdue.query(Task).filter(Task.title == "late 0").first()
+    task.overdue_notified_at = task.due_date - timedelta(hours=1)
+    overdue.commit()
+    assert service.check_and_notify_overdue_tasks(overdue)["tasks_notified"] == 1
+    assert len(handler.messages) == 6
+
+
+def test_pooled_connections_are_reused_across_batches(service, smtp, overdue):
+    handler, _ = smtp
+    service.check_and_notify_overdue_tasks(overdue)
+    service.check_and_notify_overdue_tasks(overdue)  # Nothing left to send; must not open more
+
+    assert len(handler.messages) == 5
+    assert 1 <= len(handler.sessions) <= POOL_SIZE
@@ -0,0 +1,40 @@
+"""SQL statement budgets of the task endpoints; a failure lists the statements, so an N+1 shows up by shape"""
+import pytest
+
+from app.core.sql_profiler import query_budget
+
+
+@pytest.fixture
+def task_ids(client, auth_headers):
+    label = client.post("/api/v1/labels/", json={"name": "work", "color": "#fff"}, headers=auth_headers).json()
+    ids = []
+    for n in range(10):
+        response = client.post("/api/v1/tasks/", json={"title": f"task {n}", "label_ids": [label["id"]]},
+                               headers=auth_headers)
+        ids.append(response.json()["id"])
+        client.post("/api/v1/comments/", json={"task_id": ids[-1], "content": "note"}, headers=auth_headers)
+    return ids
+
+
+def test_list_cold(client, auth_headers, task_ids):
+    # Count plus page, and one selectin query per relationship, independent of the page size
+    with query_budget(5):
+        response = client.get("/api/v1/tasks/", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()["tasks"]) == 10
+
+
+def test_list_warm(client, auth_headers, task_ids):
+    client.get("/api/v1/tasks/", headers=auth_headers)
+    # Page, generation and task snapshots all come from the caches
+    with query_budget(0):
+        response = client.get("/api/v1/tasks/", headers=auth_headers)
+    assert [task["id"] for task in response.json()["tasks"]] == task_ids[::-1]
+
+
+def test_detail(client, auth_headers, task_ids):
+    # The task joined to its labels, then comments and activity
+    with query_budget(3):
+        response = client.get(f"/api/v1/tasks/{task_ids[0]}", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()["comments"]) == 1
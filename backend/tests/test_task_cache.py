@@ -0,0 +1,28 @@
+"""Task list cache: a user's writes are visible on the next request, whichever worker served the write"""
+from app.models.task import Task
+
+
+def test_write_on_another_worker_is_seen_without_its_invalidation_message(client, auth_headers, redis, db_session):
+    owner_id = client.post("/api/v1/tasks/", json={"title": "first"}, headers=auth_headers).json()["owner_id"]
+    assert client.get("/api/v1/tasks/", headers=auth_headers).json()["total"] == 1
+    assert client.get("/api/v1/tasks/", headers=auth_headers).json()["total"] == 1  # Served from the local tier
+
+    # What another worker's AsyncTaskService does for a write; its pub/sub message never arrives here
+    db_session.add(Task(title="second", owner_id=owner_id))
+    db_session.commit()
+    redis.incr(f"tasks:user:{owner_id}:gen")
+
+    assert client.get("/api/v1/tasks/", headers=auth_headers).json()["total"] == 2
+
+
+def test_label_rename_and_delete_reach_cached_stats(client, auth_headers):
+    label = client.post("/api/v1/labels/", json={"name": "old", "color": "#fff"}, headers=auth_headers).json()
+    client.post("/api/v1/tasks/", json={"title": "tagged", "label_ids": [label["id"]]}, headers=auth_headers)
+    assert [l["name"] for l in client.get("/api/v1/tasks/stats", headers=auth_headers).json()["by_label"]] == ["old"]
+
+    client.put(f"/api/v1/labels/{label['id']}", json={"name": "new", "color": "#fff"}, headers=auth_headers)
+    assert [l["name"] for l in client.get("/api/v1/tasks/stats", headers=auth_headers).json()["by_label"]] == ["new"]
+
+    client.delete(f"/api/v1/labels/{label['id']}", headers=auth_headers)
+    assert client.get("/api/v1/tasks/stats", headers=auth_headers).json()["by_label"] == []
+    assert client.get("/api/v1/tasks/", headers=auth_headers).json()["tasks"][0]["labels"] == []
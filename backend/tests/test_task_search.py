@@ -0,0 +1,23 @@
+"""Task search: words go through the full-text index, other input falls back to substring matching"""
+
+
+def _titles(client, auth_headers, search):
+    response = client.get("/api/v1/tasks/", params={"search": search}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return sorted(task["title"] for task in response.json()["tasks"])
+
+
+def test_words_match_through_the_index(client, auth_headers):
+    for title in ["Write release notes", "Review C# notes", "Plan sprint"]:
+        client.post("/api/v1/tasks/", json={"title": title}, headers=auth_headers)
+
+    assert _titles(client, auth_headers, "note") == ["Review C# notes", "Write release notes"]
+
+
+def test_search_without_words_filters_by_substring(client, auth_headers):
+    for title in ["Review C# notes", "Plan sprint", "Fix -- separator"]:
+        client.post("/api/v1/tasks/", json={"title": title}, headers=auth_headers)
+
+    assert _titles(client, auth_headers, "#") == ["Review C# notes"]
+    assert _titles(client, auth_headers, "--") == ["Fix -- separator"]
+    assert _titles(client, auth_headers, "?!") == []
@@ -0,0 +1,37 @@
+"""Per-task snapshots: a load that raced an invalidation must not store its rendering"""
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.repositories.task_repo import AsyncTaskRepository
+from app.services.task_snapshots import task_snapshots
+
+
+def _load_and_put(task_id: int, drop_during_load: bool) -> None:
+    async def run():
+        since = await task_snapshots.sequence()
+        async with AsyncSessionLocal() as db:
+            tasks = await AsyncTaskRepository(db).get_many([task_id])
+            if drop_during_load:
+                # A write to the task commits and invalidates while this load is under way
+                await task_snapshots.invalidate([task_id])
+            await task_snapshots.put(tasks, since)
+    asyncio.run(run())
+
+
+def test_put_skips_tasks_dropped_during_the_load(client, auth_headers, redis):
+    task_id = client.post("/api/v1/tasks/", json={"title": "racy"}, headers=auth_headers).json()["id"]
+
+    _load_and_put(task_id, drop_during_load=True)
+    assert redis.get(task_snapshots.key(task_id)) is None
+
+    _load_and_put(task_id, drop_during_load=False)
+    assert redis.get(task_snapshots.key(task_id)) is not None
+
+
+def test_comment_reaches_a_cached_page(client, auth_headers):
+    task_id = client.post("/api/v1/tasks/", json={"title": "discussed"}, headers=auth_headers).json()["id"]
+    client.get("/api/v1/tasks/", headers=auth_headers)
+    client.post("/api/v1/comments/", json={"task_id": task_id, "content": "first"}, headers=auth_headers)
+
+    task = client.get("/api/v1/tasks/", headers=auth_headers).json()["tasks"][0]
+    assert [comment["content"] for comment in task["comments"]] == ["first"]
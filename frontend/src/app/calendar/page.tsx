@@ -3,9 +3,9 @@ import { useState } from 'react'
 import { useQuery } from '@tanstack/react-query'
 import { taskAPI } from '@/lib/api/tasks'
 import { ChevronLeft, ChevronRight, Plus } from 'lucide-react'
-import { format, startOfMonth, endOfMonth, eachDayOfInterval, isSameMonth, isSameDay, addMonths, subMonths } from 'date-fns'
+import { format, startOfMonth, endOfMonth, eachDayOfInterval, isSameMonth, isSameDay, addMonths, subMonths, addDays, subDays } from 'date-fns'
 import { useTaskStore } from '@/lib/store/taskStore'
-import { TaskPriority } from '@/types'
+import { TaskPriority, TaskSummary } from '@/types'
 
 const priorityColors = {
   [TaskPriority.HIGH]: 'bg-red-500/20 text-red-700 dark:text-red-300 hover:bg-red-500/30',
@@ -17,21 +17,29 @@ export default function CalendarPage() {
   const [currentDate, setCurrentDate] = useState(new Date())
   const { openTaskModal } = useTaskStore()
 
+  const monthStart = startOfMonth(currentDate)
+  const monthEnd = endOfMonth(currentDate)
+  const days = eachDayOfInterval({ start: monthStart, end: monthEnd })
+
+  // The API buckets by UTC day; pad the window a day each side and regroup by local day below
+  const windowStart = format(subDays(monthStart, 1), 'yyyy-MM-dd')
+  const windowEnd = format(addDays(monthEnd, 1), 'yyyy-MM-dd')
+
   const { data, isLoading } = useQuery({
-    queryKey: ['tasks'],
-    queryFn: () => taskAPI.getTasks({}),
+    queryKey: ['tasks', 'calendar', windowStart, windowEnd],
+    queryFn: () => taskAPI.getCalendar(windowStart, windowEnd),
     refetchOnMount: 'always',
     refetchOnWindowFocus: true,
   })
 
-  const monthStart = startOfMonth(currentDate)
-  const monthEnd = endOfMonth(currentDate)
-  const days = eachDayOfInterval({ start: monthStart, end: monthEnd })
+  const summaries: TaskSummary[] = data?.days.flatMap(day => day.tasks) || []
 
   const getTasksForDay = (date: Date) => {
-    return data?.tasks.filter(task =>
-      task.due_date && isSameDay(new Date(task.due_date), date)
-    ) || []
+    return summaries.filter(task => isSameDay(new Date(task.due_date), date))
+  }
+
+  const openTask = async (taskId: number) => {
+    openTaskModal(await taskAPI.getTask(taskId))
   }
 
   return (
@@ -125,7 +133,7 @@ export default function CalendarPage() {
                             }`}
                           onClick={(e) => {
                             e.stopPropagation()
-                            openTaskModal(task)
+                            openTask(task.id)
                           }}
                         >
                           {task.title}
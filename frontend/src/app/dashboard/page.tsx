@@ -16,9 +16,9 @@ export default function DashboardPage() {
     setMounted(true)
   }, [])
 
-  const { data: tasksData, isLoading: loading } = useQuery({
-    queryKey: ['tasks'],
-    queryFn: () => taskAPI.getTasks({}),
+  const { data: taskStats, isLoading: loading } = useQuery({
+    queryKey: ['tasks', 'stats'],
+    queryFn: () => taskAPI.getStats(),
     enabled: mounted,
     retry: 0, // Don't retry on first load
     staleTime: 10 * 60 * 1000, // 10 minutes - data stays fresh longer
@@ -34,11 +34,10 @@ export default function DashboardPage() {
     setUser(userData)
   }, [mounted])
 
-  const tasks = tasksData?.tasks || []
   const stats = {
-    total: tasks.length,
-    completed: tasks.filter((t: any) => t.status === 'completed').length,
-    pending: tasks.filter((t: any) => t.status !== 'completed').length
+    total: taskStats?.total ?? 0,
+    completed: taskStats?.by_status.completed ?? 0,
+    pending: (taskStats?.total ?? 0) - (taskStats?.by_status.completed ?? 0)
   }
 
   const handleLogout = () => {
@@ -117,7 +116,7 @@ export default function DashboardPage() {
           {/* Analytics Charts */}
           <div className="mt-8">
             <h3 className="text-xl font-semibold text-gray-800 mb-4">📊 Analytics</h3>
-            <TaskStatsCharts tasks={tasks} />
+            {taskStats && <TaskStatsCharts stats={taskStats} />}
           </div>
 
           {/* Quick Actions */}
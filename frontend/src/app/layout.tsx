@@ -5,6 +5,12 @@ import TaskModal from '@/components/tasks/TaskModal'
 import '../styles/globals.css'
 import { useState } from 'react'
 import { Toaster } from 'react-hot-toast'
+import { useTaskStream } from '@/lib/hooks/useTaskStream'
+
+function TaskStreamListener() {
+  useTaskStream()
+  return null
+}
 
 export default function RootLayout({ children }: { children: React.ReactNode }) {
   const [queryClient] = useState(() =>
@@ -22,6 +28,7 @@ export default function RootLayout({ children }: { children: React.ReactNode })
     <html lang="en">
       <body>
         <QueryClientProvider client={queryClient}>
+          <TaskStreamListener />
           <div className="flex min-h-screen">
             <Sidebar />
             <main className="flex-1">{children}</main>
@@ -2,10 +2,10 @@
 
 import { useMemo } from 'react'
 import { PieChart, Pie, Cell, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts'
-import { Task } from '@/types'
+import { TaskStats } from '@/types'
 
 interface TaskStatsChartsProps {
-    tasks: Task[]
+    stats: TaskStats
 }
 
 const COLORS = {
@@ -20,39 +20,34 @@ const PRIORITY_COLORS = {
     low: '#10b981'        // green
 }
 
-export default function TaskStatsCharts({ tasks }: TaskStatsChartsProps) {
+export default function TaskStatsCharts({ stats }: TaskStatsChartsProps) {
     // Calculate status distribution
     const statusData = useMemo(() => {
-        const now = new Date()
-        const completed = tasks.filter(t => t.status === 'completed').length
-        const overdue = tasks.filter(t =>
-            t.status !== 'completed' &&
-            t.due_date &&
-            new Date(t.due_date) < now
-        ).length
-        const pending = tasks.length - completed - overdue
+        const completed = stats.by_status.completed
+        const overdue = stats.overdue
+        const pending = stats.total - completed - overdue
 
         return [
             { name: 'Completed', value: completed, color: COLORS.completed },
             { name: 'Pending', value: pending, color: COLORS.pending },
             { name: 'Overdue', value: overdue, color: COLORS.overdue }
         ].filter(item => item.value > 0)
-    }, [tasks])
+    }, [stats])
 
     // Calculate priority distribution
     const priorityData = useMemo(() => {
-        const high = tasks.filter(t => t.priority === 'high').length
-        const medium = tasks.filter(t => t.priority === 'medium').length
-        const low = tasks.filter(t => t.priority === 'low').length
+        const high = stats.by_priority.high
+        const medium = stats.by_priority.medium
+        const low = stats.by_priority.low
 
         return [
             { name: 'High', value: high, color: PRIORITY_COLORS.high },
             { name: 'Medium', value: medium, color: PRIORITY_COLORS.medium },
             { name: 'Low', value: low, color: PRIORITY_COLORS.low }
         ]
-    }, [tasks])
+    }, [stats])
 
-    if (tasks.length === 0) {
+    if (stats.total === 0) {
         return (
             <div className="bg-gray-50 rounded-lg p-8 text-center">
                 <p className="text-gray-500">No tasks yet. Create some tasks to see analytics!</p>
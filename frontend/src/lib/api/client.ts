@@ -48,6 +48,8 @@ if (typeof window !== 'undefined') {
 
 
 
+export const API_URL = finalApiUrl
+
 export const apiClient = axios.create({
   baseURL: finalApiUrl,
   headers: {
@@ -1,5 +1,5 @@
 import { apiClient } from './client'
-import type { Task, TaskCreateInput, TaskUpdateInput, TaskListResponse, TaskStatus, TaskPriority } from '@/types'
+import type { Task, TaskCreateInput, TaskUpdateInput, TaskListResponse, TaskStats, TaskCalendarResponse, TaskStatus, TaskPriority } from '@/types'
 
 interface GetTasksParams {
   search?: string
@@ -11,6 +11,7 @@ interface GetTasksParams {
   page_size?: number
   sort_by?: string
   sort_order?: string
+  cursor?: string
 }
 
 export const taskAPI = {
@@ -18,6 +19,14 @@ export const taskAPI = {
     const response = await apiClient.get('/tasks/', { params })
     return response.data
   },
+  getCalendar: async (start: string, end: string): Promise<TaskCalendarResponse> => {
+    const response = await apiClient.get('/tasks/calendar', { params: { start, end } })
+    return response.data
+  },
+  getStats: async (): Promise<TaskStats> => {
+    const response = await apiClient.get('/tasks/stats')
+    return response.data
+  },
   getTask: async (taskId: number): Promise<Task> => {
     const response = await apiClient.get(`/tasks/${taskId}`)
     return response.data
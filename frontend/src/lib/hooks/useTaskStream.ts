@@ -0,0 +1,61 @@
+import { useEffect } from 'react'
+import { useQueryClient } from '@tanstack/react-query'
+import { API_URL } from '@/lib/api/client'
+
+interface TaskChangeEvent {
+    type: string
+    task_id?: number
+}
+
+const EVENT_TYPES = ['task.created', 'task.updated', 'task.deleted', 'task.restored', 'comment.created', 'resync']
+
+// Keeps cached task queries fresh from the server's /tasks/stream instead of polling
+export function useTaskStream() {
+    const queryClient = useQueryClient()
+
+    useEffect(() => {
+        let source: EventSource | null = null
+        let retryTimer: ReturnType<typeof setTimeout> | undefined
+        let hadError = false
+
+        const onEvent = (message: MessageEvent) => {
+            const event: TaskChangeEvent = JSON.parse(message.data)
+            if (event.type !== 'comment.created') {
+                queryClient.invalidateQueries({ queryKey: ['tasks'] })
+            }
+            if (event.type === 'comment.created' || event.type === 'resync') {
+                queryClient.invalidateQueries({ queryKey: ['comments'] })
+            }
+            queryClient.invalidateQueries({ queryKey: ['activities'] })
+        }
+
+        const connect = () => {
+            const token = localStorage.getItem('access_token')
+            if (!token) {
+                retryTimer = setTimeout(connect, 5000)
+                return
+            }
+            source = new EventSource(`${API_URL}/tasks/stream?token=${encodeURIComponent(token)}`)
+            EVENT_TYPES.forEach((type) => source!.addEventListener(type, onEvent as EventListener))
+            source.onopen = () => {
+                // Changes made while disconnected were missed
+                if (hadError) {
+                    hadError = false
+                    queryClient.invalidateQueries()
+                }
+            }
+            source.onerror = () => {
+                // The stream ends when the access token expires; reconnect with the current one
+                hadError = true
+                source?.close()
+                retryTimer = setTimeout(connect, 5000)
+            }
+        }
+
+        connect()
+        return () => {
+            clearTimeout(retryTimer)
+            source?.close()
+        }
+    }, [queryClient])
+}
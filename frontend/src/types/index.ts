@@ -90,4 +90,42 @@ export interface TaskListResponse {
   page: number
   page_size: number
   total_pages: number
-}
\ No newline at end of file
+  next_cursor?: string | null
+  prev_cursor?: string | null
+}
+
+export interface TaskSummary {
+  id: number
+  title: string
+  status: TaskStatus
+  priority: TaskPriority
+  due_date: string
+}
+
+export interface CalendarDay {
+  date: string
+  tasks: TaskSummary[]
+}
+
+export interface TaskCalendarResponse {
+  start: string
+  end: string
+  days: CalendarDay[]
+  truncated: boolean
+}
+
+export interface LabelCount {
+  label_id: number
+  name: string
+  color?: string | null
+  count: number
+}
+
+export interface TaskStats {
+  total: number
+  by_status: Record<TaskStatus, number>
+  by_priority: Record<TaskPriority, number>
+  overdue: number
+  due_this_week: number
+  by_label: LabelCount[]
+}